@@ -1,13 +1,167 @@
-import json
+import asyncio
+import functools
+import hashlib
+import logging
+import math
 import os
+import time
+import weakref
+from collections import Counter, OrderedDict
+from collections.abc import AsyncIterator, Iterator
 from enum import Enum
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
+import httpx
+import orjson
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, AzureOpenAI
+from openai.types.chat import ChatCompletion
 from pydantic import BaseModel
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 
-load_dotenv()  # Load environment variables from .env file
+logger = logging.getLogger(__name__)
+
+# Connection pools shared by all threads, so that TCP + TLS handshakes are
+# amortized over every completion call instead of paid per request
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=50, max_keepalive_connections=20, keepalive_expiry=30.0
+)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+_HTTP_CLIENT = httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+# Async connections are bound to the event loop that opened them, so each loop gets
+# its own async client. Entries are dropped along with their loop.
+_ASYNC_CLIENTS: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, AsyncAzureOpenAI
+] = weakref.WeakKeyDictionary()
+
+# Number of retries of rate-limited (429), timed out and connection-failed requests.
+# The SDK backs off exponentially with jitter and honors the Retry-After header,
+# and since retries happen inside the call they stay within the concurrency cap
+# of batched requests.
+_MAX_RETRIES = 6
+
+
+def close_http_clients():
+    """Close the sync HTTP connection pool shared by all threads.
+
+    Call this once at shutdown, when no thread is going to send messages anymore.
+    """
+    _HTTP_CLIENT.close()
+
+
+async def aclose_http_clients():
+    """Close the async client of the running event loop, if any.
+
+    Call this at the end of the loop that sent the messages, e.g. in the shutdown
+    hook of the server, since its connections cannot be closed from another loop.
+    """
+    client = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def _azure_credentials() -> dict:
+    # Load environment variables from .env file, only when a client is first needed
+    # so that the environment can still be set up after importing this module
+    load_dotenv()
+    return {
+        "api_key": os.environ["AZURE_OPENAI_API_KEY"],
+        "azure_endpoint": os.environ["AZURE_OPENAI_ENDPOINT"],
+        "api_version": os.environ["AZURE_OPENAI_API_VERSION"],
+    }
+
+
+@functools.cache
+def _get_client() -> AzureOpenAI:
+    """Get the Azure OpenAI client shared by all threads, created on first use."""
+    return AzureOpenAI(
+        **_azure_credentials(), http_client=_HTTP_CLIENT, max_retries=_MAX_RETRIES
+    )
+
+
+def _get_async_client() -> AsyncAzureOpenAI:
+    """Get the async Azure OpenAI client of the running event loop.
+
+    It is shared by all threads sending messages on that loop and created on first
+    use.
+    """
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None:
+        client = _ASYNC_CLIENTS[loop] = AsyncAzureOpenAI(
+            **_azure_credentials(),
+            http_client=httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT),
+            max_retries=_MAX_RETRIES,
+        )
+    return client
+
+
+def _strict_json_schema(schema: dict, root: dict) -> dict:
+    """Make a JSON schema conform to the strict subset of structured outputs, in place.
+
+    Same rules as the SDK applies for `parse()`: objects are closed and all their
+    properties required, `None` defaults are dropped and `$ref`s with sibling keys
+    are inlined. The variants of `anyOf`, `oneOf` and `allOf` are made strict too.
+    """
+    sub_schemas = [
+        *schema.get("$defs", {}).values(),
+        *schema.get("properties", {}).values(),
+        *schema.get("anyOf", ()),
+        *schema.get("oneOf", ()),
+        *schema.get("allOf", ()),
+    ]
+    if isinstance(schema.get("items"), dict):
+        sub_schemas.append(schema["items"])
+    for sub_schema in sub_schemas:
+        _strict_json_schema(sub_schema, root)
+
+    if schema.get("type") == "object":
+        schema.setdefault("additionalProperties", False)
+    if "properties" in schema:
+        schema["required"] = list(schema["properties"])
+    if len(schema.get("allOf", ())) == 1:
+        schema.update(schema.pop("allOf")[0])
+    if "default" in schema and schema["default"] is None:
+        del schema["default"]
+
+    ref = schema.get("$ref")
+    if ref and len(schema) > 1:
+        resolved = root
+        for key in ref.removeprefix("#/").split("/"):
+            resolved = resolved[key]
+        # The keys next to the `$ref` take priority over the referenced schema
+        schema.update({**resolved, **schema})
+        del schema["$ref"]
+        return _strict_json_schema(schema, root)
+    return schema
+
+
+@functools.cache
+def _response_format_param(response_format: type[BaseModel]) -> dict:
+    """Build the `response_format` request parameter of a structured output model.
+
+    Only needed where the request is not sent through `parse()`, i.e. streams and
+    batch lines. Built from the pydantic JSON schema rather than with the private
+    helpers of the SDK, which may change in any release.
+    """
+    schema = response_format.model_json_schema()
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "schema": _strict_json_schema(schema, schema),
+            "name": response_format.__name__,
+            "strict": True,
+        },
+    }
+
+
+@functools.cache
+def _response_format_schema(response_format: type[BaseModel]) -> str:
+    """JSON schema of a response format, as hashed in the cache keys."""
+    return orjson.dumps(
+        response_format.model_json_schema(), option=orjson.OPT_SORT_KEYS
+    ).decode()
 
 
 class Role(Enum):
@@ -19,32 +173,345 @@ class Role(Enum):
 class Message(TypedDict):
     role: Role
     content: str
+    # Validated response_format instance of structured responses, never sent to the API
+    parsed: NotRequired[BaseModel | None]
+
+
+class LLMCache:
+    """Cache of LLM responses for deterministic (temperature == 0) requests.
+
+    Entries are kept in an in-process LRU and, if a Redis client is given,
+    also in Redis with a TTL so that they survive restarts and are shared
+    between processes. The async methods only go through `async_redis_client`,
+    so that the event loop is never blocked on Redis.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        redis_client: Redis | None = None,
+        ttl: int = 3600,
+        async_redis_client: AsyncRedis | None = None,
+    ):
+        self.maxsize = maxsize
+        self.redis_client = redis_client
+        self.async_redis_client = async_redis_client
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Message] = OrderedDict()
+
+    @staticmethod
+    def cache_key(
+        model: str,
+        messages: list[Message],
+        temperature: float,
+        top_p: float,
+        response_format: BaseModel | None = None,
+        stream: bool = False,
+    ) -> str | None:
+        """Build the cache key of a request, or None if it is not cacheable.
+
+        The JSON schema of the response format is part of the key, so that
+        schema changes invalidate the cached responses. Streamed responses are
+        kept apart since they come without the `parsed` instance.
+        """
+        if temperature > 0:
+            return None
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "top_p": top_p,
+            "response_format": _response_format_schema(response_format)
+            if response_format is not None
+            else None,
+            "stream": stream,
+        }
+        return hashlib.sha256(
+            orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        ).hexdigest()
+
+    def get(self, key: str, response_format: BaseModel | None = None) -> Message | None:
+        """Return the cached response of the key, None on a miss.
+
+        `parsed` of structured responses read from Redis is rebuilt from its
+        stored fields as an instance of `response_format`.
+        """
+        message = self._entries.get(key)
+        if message is None and self.redis_client is not None:
+            try:
+                value = self.redis_client.get(f"llm_cache:{key}")
+            except Exception as e:
+                logger.warning("An error occurred while reading the LLM cache: %s", e)
+            else:
+                message = self._load(key, value, response_format)
+        return self._count(key, message)
+
+    async def aget(
+        self, key: str, response_format: BaseModel | None = None
+    ) -> Message | None:
+        """Async variant of `get`."""
+        message = self._entries.get(key)
+        if message is None and self.async_redis_client is not None:
+            try:
+                value = await self.async_redis_client.get(f"llm_cache:{key}")
+            except Exception as e:
+                logger.warning("An error occurred while reading the LLM cache: %s", e)
+            else:
+                message = self._load(key, value, response_format)
+        return self._count(key, message)
+
+    def set(self, key: str, message: Message):
+        self._store(key, message)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(
+                    f"llm_cache:{key}", self._dumps(message), ex=self.ttl
+                )
+            except Exception as e:
+                logger.warning("An error occurred while writing the LLM cache: %s", e)
+
+    async def aset(self, key: str, message: Message):
+        """Async variant of `set`."""
+        self._store(key, message)
+        if self.async_redis_client is not None:
+            try:
+                await self.async_redis_client.set(
+                    f"llm_cache:{key}", self._dumps(message), ex=self.ttl
+                )
+            except Exception as e:
+                logger.warning("An error occurred while writing the LLM cache: %s", e)
+
+    @staticmethod
+    def _dumps(message: Message) -> bytes:
+        parsed = message.get("parsed")
+        if parsed is not None:
+            parsed = parsed.model_dump(mode="json")
+        return orjson.dumps(
+            {"role": message["role"], "content": message["content"], "parsed": parsed}
+        )
+
+    def _load(
+        self,
+        key: str,
+        value: bytes | str | None,
+        response_format: BaseModel | None = None,
+    ) -> Message | None:
+        """Keep a response read from Redis in the LRU."""
+        if value is None:
+            return None
+        fields = orjson.loads(value)
+        parsed = fields.pop("parsed", None)
+        message = Message(**fields)
+        if parsed is not None and response_format is not None:
+            message["parsed"] = response_format.model_validate(parsed)
+        self._store(key, message)
+        return message
+
+    def _count(self, key: str, message: Message | None) -> Message | None:
+        if message is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return message
+
+    def _store(self, key: str, message: Message):
+        self._entries[key] = message
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class SemanticCache:
+    """Cache of LLM responses looked up by embedding similarity of the prompt.
+
+    Near-duplicate prompts (different whitespace or phrasing) return the response
+    of a previous prompt when the cosine similarity of their embeddings is above
+    `threshold`. Entries only match when the preceding conversation and the
+    response format are identical, to avoid cross-conversation contamination.
+    Entries expire after `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        embedding_model: str = "text-embedding-3-small",
+        threshold: float = 0.92,
+        maxsize: int = 256,
+        ttl: int = 3600,
+    ):
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # (context key, normalized prompt embedding, response, creation time), oldest
+        # first
+        self._entries: list[tuple[str, list[float], Message, float]] = []
+
+    @staticmethod
+    def context_key(
+        messages: list[Message],
+        response_format: BaseModel | None = None,
+        stream: bool = False,
+    ) -> str:
+        """Hash the conversation preceding the prompt and the response format.
+
+        As in `LLMCache.cache_key`, streamed responses are kept apart.
+        """
+        payload = {
+            "messages": messages,
+            "response_format": _response_format_schema(response_format)
+            if response_format is not None
+            else None,
+            "stream": stream,
+        }
+        return hashlib.sha256(
+            orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        ).hexdigest()
+
+    def embed(self, client: AzureOpenAI, content: str) -> list[float]:
+        """Embed the content and normalize the vector to unit length."""
+        response = client.embeddings.create(model=self.embedding_model, input=content)
+        return self._normalize(response.data[0].embedding)
+
+    async def aembed(self, aclient: AsyncAzureOpenAI, content: str) -> list[float]:
+        """Async variant of `embed`."""
+        response = await aclient.embeddings.create(
+            model=self.embedding_model, input=content
+        )
+        return self._normalize(response.data[0].embedding)
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> list[float]:
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def get(self, context_key: str, vector: list[float]) -> Message | None:
+        self._prune()
+        best_similarity, best_message = self.threshold, None
+        for key, cached_vector, message, _ in self._entries:
+            if key != context_key:
+                continue
+            similarity = sum(a * b for a, b in zip(vector, cached_vector))
+            if similarity > best_similarity:
+                best_similarity, best_message = similarity, message
+
+        if best_message is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return best_message
+
+    def set(self, context_key: str, vector: list[float], message: Message):
+        self._prune()
+        self._entries.append((context_key, vector, message, time.monotonic()))
+        if len(self._entries) > self.maxsize:
+            self._entries.pop(0)
+
+    def _prune(self):
+        """Drop the expired entries, which are all at the start of the list."""
+        expires_before = time.monotonic() - self.ttl
+        expired = 0
+        for *_, created_at in self._entries:
+            if created_at > expires_before:
+                break
+            expired += 1
+        if expired:
+            del self._entries[:expired]
 
 
 # ref: https://platform.openai.com/docs/api-reference/chat
 class Thread:
-    client = AzureOpenAI(
-        # This is the default and can be omitted
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    )
+    @property
+    def client(self) -> AzureOpenAI:
+        return _get_client()
 
-    def __init__(self, sys_prompt: str = "an assistant"):
-        self.message_stack = [Message(role="system", content=sys_prompt)]
+    @property
+    def aclient(self) -> AsyncAzureOpenAI:
+        return _get_async_client()
+
+    # Maximum number of in-flight requests when sending messages in batch
+    max_concurrency = 5
+    # Optional cache of deterministic requests, shared by all threads, e.g.
+    # LLMCache(redis_client=...). Only requests sent with temperature 0 are cached,
+    # so it also needs `temperature` to be set to 0.
+    cache: LLMCache | None = None
+    # Optional embedding-based cache for near-duplicate prompts, e.g. SemanticCache()
+    semantic_cache: SemanticCache | None = None
+
+    def __init__(self, sys_prompt: str = "an assistant", static_context: str = ""):
+        self.sys_prompt = sys_prompt
+        self.static_context = static_context
+        self.message_stack = [Message(role="system", content=self._system_content())]
         self.model = "gpt-4.1"
-        self.total_tokens = 0
-        self.total_prompt_tokens = 0
-        self.total_completion_tokens = 0
+        # Token usage of the thread: total, prompt, completion and cached prompt tokens
+        self.usage = Counter()
         self.temperature = 1.0
         self.top_p = 1.0
 
+    @property
+    def total_tokens(self) -> int:
+        return self.usage["total"]
+
+    @property
+    def total_prompt_tokens(self) -> int:
+        return self.usage["prompt"]
+
+    @property
+    def total_completion_tokens(self) -> int:
+        return self.usage["completion"]
+
+    @property
+    def total_cached_prompt_tokens(self) -> int:
+        """Prompt tokens served from the prompt cache of OpenAI/Azure."""
+        return self.usage["prompt_cached"]
+
+    def _system_content(self) -> str:
+        if not self.static_context:
+            return self.sys_prompt
+        return f"{self.sys_prompt}\n\n{self.static_context}"
+
+    def set_static_context(self, static_context: str):
+        """Set context that is invariant for the whole conversation (e.g. company info).
+
+        The context is appended to the system prompt, so that the first message is a
+        long, stable prefix shared by every request, which maximizes the prompt
+        caching done by OpenAI/Azure. Anything that varies per request must go in
+        the trailing user messages instead.
+        It must be set before sending any message, since the first message of the
+        stack is never mutated afterwards.
+
+        Args:
+            static_context (str): The static context to add to the system prompt.
+        """
+        if len(self.message_stack) > 1:
+            raise RuntimeError(
+                "The static context must be set before sending any message"
+            )
+        self.static_context = static_context
+        self.message_stack[0] = Message(role="system", content=self._system_content())
+
     def _client_send_message(
         self,
         message_stack: list[Message],
         verbose: bool = False,
         response_format: BaseModel | None = None,
     ):
+        cache_key = self._cache_key(message_stack, response_format)
+        if cache_key is not None:
+            cached_message = self.cache.get(cache_key, response_format)
+            if cached_message is not None:
+                return cached_message
+
+        semantic_entry, cached_message = self._semantic_cache_lookup(
+            message_stack, response_format
+        )
+        if cached_message is not None:
+            return cached_message
+
         try:
             if response_format is None:
                 send_request = self.client.chat.completions.create(
@@ -62,27 +529,240 @@ class Thread:
                     top_p=self.top_p,
                     response_format=response_format,
                 )
-            response_body = json.loads(send_request.to_json())
-            # finish_reason = response_body['choices'][0]['finish_reason']
-            total_tokens, prompt_tokens, completion_tokens = (
-                response_body["usage"]["total_tokens"],
-                response_body["usage"]["prompt_tokens"],
-                response_body["usage"]["completion_tokens"],
+            response_message = self._handle_response(send_request, verbose)
+            if cache_key is not None:
+                self.cache.set(cache_key, response_message)
+            self._semantic_cache_store(semantic_entry, response_message)
+            return response_message
+        except Exception:
+            logger.exception("An error occurred while sending the message")
+
+    def _handle_response(self, send_request, verbose: bool = False) -> Message:
+        """Record the token usage of a completion and return its message."""
+        # Read the fields from the SDK object directly instead of a JSON round-trip
+        # finish_reason = send_request.choices[0].finish_reason
+        self._record_usage(send_request.usage, verbose)
+        message = send_request.choices[0].message
+        # Structured responses are already validated by the SDK, pass them on so that
+        # callers don't have to validate the content again
+        return Message(
+            role=message.role,
+            content=message.content,
+            parsed=getattr(message, "parsed", None),
+        )
+
+    def _record_usage(self, usage, verbose: bool = False):
+        cached_tokens = getattr(usage.prompt_tokens_details, "cached_tokens", 0) or 0
+        self.usage.update(
+            total=usage.total_tokens,
+            prompt=usage.prompt_tokens,
+            completion=usage.completion_tokens,
+            prompt_cached=cached_tokens,
+        )
+
+        if verbose:
+            print(
+                f"Using prompt tokens: {usage.prompt_tokens} ({cached_tokens} cached), "
+                f"completion token: {usage.completion_tokens}"
             )
-            self.total_tokens += total_tokens
-            self.total_prompt_tokens += prompt_tokens
-            self.total_completion_tokens += completion_tokens
 
-            if verbose:
-                print(
-                    f"Using prompt tokens: {prompt_tokens}, completion token: {completion_tokens}"
-                )
-            return Message(
-                role=response_body["choices"][0]["message"]["role"],
-                content=response_body["choices"][0]["message"]["content"],
+    def _stream_request_kwargs(
+        self, message_stack: list[Message], response_format: BaseModel | None = None
+    ) -> dict:
+        kwargs = {
+            "messages": message_stack,
+            "model": self.model,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "stream": True,
+            # The last chunk then carries the token usage of the whole response
+            "stream_options": {"include_usage": True},
+        }
+        if response_format is not None:
+            kwargs["response_format"] = _response_format_param(response_format)
+        return kwargs
+
+    def _cache_key(
+        self,
+        message_stack: list[Message],
+        response_format: BaseModel | None = None,
+        stream: bool = False,
+    ) -> str | None:
+        """Return the exact cache key of a request, None if not cacheable."""
+        if self.cache is None:
+            return None
+        return self.cache.cache_key(
+            self.model,
+            message_stack,
+            self.temperature,
+            self.top_p,
+            response_format,
+            stream,
+        )
+
+    def _stream_cache_lookup(
+        self, message_stack: list[Message], response_format: BaseModel | None = None
+    ) -> tuple[str | None, Message | None]:
+        """Return the cache key of a streamed request and its cached response, if any."""
+        cache_key = self._cache_key(message_stack, response_format, stream=True)
+        if cache_key is None:
+            return None, None
+        return cache_key, self.cache.get(cache_key)
+
+    async def _async_stream_cache_lookup(
+        self, message_stack: list[Message], response_format: BaseModel | None = None
+    ) -> tuple[str | None, Message | None]:
+        """Async variant of `_stream_cache_lookup`."""
+        cache_key = self._cache_key(message_stack, response_format, stream=True)
+        if cache_key is None:
+            return None, None
+        return cache_key, await self.cache.aget(cache_key)
+
+    def _semantic_context_key(
+        self,
+        message_stack: list[Message],
+        response_format: BaseModel | None = None,
+        stream: bool = False,
+    ) -> str | None:
+        """Return the semantic cache context of a request, None if not cacheable."""
+        if self.semantic_cache is None or self.temperature > 0:
+            return None
+        return self.semantic_cache.context_key(
+            message_stack[:-1], response_format, stream
+        )
+
+    def _semantic_cache_lookup(
+        self,
+        message_stack: list[Message],
+        response_format: BaseModel | None = None,
+        stream: bool = False,
+    ) -> tuple[tuple[str, list[float]] | None, Message | None]:
+        """Return the semantic cache entry of a request and its cached response."""
+        context_key = self._semantic_context_key(message_stack, response_format, stream)
+        if context_key is None:
+            return None, None
+        try:
+            vector = self.semantic_cache.embed(
+                self.client, message_stack[-1]["content"]
+            )
+        except Exception as e:
+            logger.warning(
+                "An error occurred while looking up the semantic cache: %s", e
+            )
+            return None, None
+        return (context_key, vector), self.semantic_cache.get(context_key, vector)
+
+    async def _async_semantic_cache_lookup(
+        self,
+        message_stack: list[Message],
+        response_format: BaseModel | None = None,
+        stream: bool = False,
+    ) -> tuple[tuple[str, list[float]] | None, Message | None]:
+        """Async variant of `_semantic_cache_lookup`."""
+        context_key = self._semantic_context_key(message_stack, response_format, stream)
+        if context_key is None:
+            return None, None
+        try:
+            vector = await self.semantic_cache.aembed(
+                self.aclient, message_stack[-1]["content"]
             )
         except Exception as e:
-            print(f"An error occurred while sending the message: {e}")
+            logger.warning(
+                "An error occurred while looking up the semantic cache: %s", e
+            )
+            return None, None
+        return (context_key, vector), self.semantic_cache.get(context_key, vector)
+
+    def _semantic_cache_store(
+        self, semantic_entry: tuple[str, list[float]] | None, message: Message
+    ):
+        """Store the response of a request looked up in the semantic cache."""
+        if semantic_entry is not None:
+            self.semantic_cache.set(*semantic_entry, message)
+
+    def _handle_stream_chunk(self, chunk, verbose: bool = False) -> str:
+        """Record the token usage if present and return the content delta of a chunk."""
+        if chunk.usage is not None:
+            self._record_usage(chunk.usage, verbose)
+        if not chunk.choices:
+            return ""
+        return chunk.choices[0].delta.content or ""
+
+    async def _async_client_send_message(
+        self,
+        message_stack: list[Message],
+        verbose: bool = False,
+        response_format: BaseModel | None = None,
+    ):
+        cache_key = self._cache_key(message_stack, response_format)
+        if cache_key is not None:
+            cached_message = await self.cache.aget(cache_key, response_format)
+            if cached_message is not None:
+                return cached_message
+
+        semantic_entry, cached_message = await self._async_semantic_cache_lookup(
+            message_stack, response_format
+        )
+        if cached_message is not None:
+            return cached_message
+
+        try:
+            if response_format is None:
+                send_request = await self.aclient.chat.completions.create(
+                    messages=message_stack,
+                    model=self.model,
+                    temperature=self.temperature,
+                    top_p=self.top_p,
+                )
+            else:
+                send_request = await self.aclient.beta.chat.completions.parse(
+                    messages=message_stack,
+                    model=self.model,
+                    temperature=self.temperature,
+                    top_p=self.top_p,
+                    response_format=response_format,
+                )
+            response_message = self._handle_response(send_request, verbose)
+            if cache_key is not None:
+                await self.cache.aset(cache_key, response_message)
+            self._semantic_cache_store(semantic_entry, response_message)
+            return response_message
+        except Exception:
+            logger.exception("An error occurred while sending the message")
+
+    async def send_messages_batch(
+        self,
+        contents: list[str],
+        verbose: bool = False,
+        response_format: BaseModel | None = None,
+    ) -> list[Message]:
+        """Send independent user messages concurrently.
+
+        Each content is sent as its own conversation on top of the system prompt,
+        so the message stack of this thread is left untouched.
+        At most `max_concurrency` requests are in flight at the same time.
+
+        Args:
+            contents (list[str]): The user messages to send.
+            verbose (bool): Whether to print the token usage of each call.
+            response_format (BaseModel | None): Optional structured output format.
+
+        Returns:
+            list[Message]: The response messages, in the same order as `contents`.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _controlled_send_message(content: str):
+            async with semaphore:
+                return await self._async_client_send_message(
+                    [self.message_stack[0], Message(role="user", content=content)],
+                    verbose,
+                    response_format,
+                )
+
+        return await asyncio.gather(
+            *[_controlled_send_message(content) for content in contents]
+        )
 
     def send_message(
         self,
@@ -92,25 +772,285 @@ class Thread:
         verbose: bool = False,
         response_format: BaseModel | None = None,
     ) -> str:
-        message = Message(role="user", content=content)
-        self.message_stack.append(message)
+        # Work on a copy of the stack, so it is only updated when the call succeeds
+        message_stack = [*self.message_stack, Message(role="user", content=content)]
 
         response_message = self._client_send_message(
-            self.message_stack, verbose, response_format
+            message_stack, verbose, response_format
         )
+        self._finish_send_message(
+            content, message_stack, response_message, save_message, show_all, verbose
+        )
+        return response_message
 
-        if save_message:
-            self.message_stack.append(response_message)
-        else:
-            self.message_stack.pop()
+    async def async_send_message(
+        self,
+        content: str,
+        save_message: bool,
+        show_all: bool = False,
+        verbose: bool = False,
+        response_format: BaseModel | None = None,
+    ) -> str:
+        """Async variant of `send_message`, awaiting the response on the async client."""
+        message_stack = [*self.message_stack, Message(role="user", content=content)]
+
+        response_message = await self._async_client_send_message(
+            message_stack, verbose, response_format
+        )
+        self._finish_send_message(
+            content, message_stack, response_message, save_message, show_all, verbose
+        )
+        return response_message
+
+    def _finish_send_message(
+        self,
+        content: str,
+        message_stack: list[Message],
+        response_message: Message | None,
+        save_message: bool,
+        show_all: bool,
+        verbose: bool,
+    ):
+        """Save the response of a sent message in the stack and print it as requested."""
+        if save_message and response_message is not None:
+            self.message_stack = [
+                *message_stack,
+                Message(
+                    role=response_message["role"], content=response_message["content"]
+                ),
+            ]
 
         if show_all:
             for message in self.message_stack:
                 print(f"role: {message['role']}\n\nContent:{message['content']}")
         else:
-            if verbose:
+            if verbose and response_message is not None:
                 print(f"Input:\n {content}\n")
                 print(f"Output:\n {response_message['content']}")
                 # print(f"Output type: {type(response_message['content'])}")
 
-        return response_message
+    def send_message_stream(
+        self,
+        content: str,
+        save_message: bool,
+        verbose: bool = False,
+        response_format: BaseModel | None = None,
+    ) -> Iterator[str]:
+        """Send a message and yield the response content as it is generated.
+
+        The message stack is only updated once the whole response was received.
+        With a response format, the yielded pieces are parts of the JSON document.
+
+        Args:
+            content (str): The user message.
+            save_message (bool): Whether to keep the message and its response in the stack.
+            verbose (bool): Whether to print the token usage.
+            response_format (BaseModel | None): Optional structured output format.
+
+        Yields:
+            str: The content of the response, piece by piece. A cached response is
+            yielded at once.
+
+        Raises:
+            Exception: The error of the request if the stream failed, in which case
+            the message stack is left untouched.
+        """
+        message_stack = [*self.message_stack, Message(role="user", content=content)]
+        cache_key, cached_message = self._stream_cache_lookup(
+            message_stack, response_format
+        )
+        semantic_entry = None
+        if cached_message is None:
+            semantic_entry, cached_message = self._semantic_cache_lookup(
+                message_stack, response_format, stream=True
+            )
+        if cached_message is not None:
+            pieces = [cached_message["content"]]
+            yield cached_message["content"]
+        else:
+            pieces = []
+            try:
+                stream = self.client.chat.completions.create(
+                    **self._stream_request_kwargs(message_stack, response_format)
+                )
+                for chunk in stream:
+                    piece = self._handle_stream_chunk(chunk, verbose)
+                    if piece:
+                        pieces.append(piece)
+                        yield piece
+            except Exception:
+                # Callers must be able to tell a failed stream from a complete one
+                logger.exception("An error occurred while streaming the message")
+                raise
+            response_message = Message(role="assistant", content="".join(pieces))
+            if cache_key is not None:
+                self.cache.set(cache_key, response_message)
+            self._semantic_cache_store(semantic_entry, response_message)
+
+        if save_message:
+            self.message_stack = [
+                *message_stack,
+                Message(role="assistant", content="".join(pieces)),
+            ]
+
+    async def async_send_message_stream(
+        self,
+        content: str,
+        save_message: bool,
+        verbose: bool = False,
+        response_format: BaseModel | None = None,
+    ) -> AsyncIterator[str]:
+        """Async variant of `send_message_stream`."""
+        message_stack = [*self.message_stack, Message(role="user", content=content)]
+        cache_key, cached_message = await self._async_stream_cache_lookup(
+            message_stack, response_format
+        )
+        semantic_entry = None
+        if cached_message is None:
+            semantic_entry, cached_message = await self._async_semantic_cache_lookup(
+                message_stack, response_format, stream=True
+            )
+        if cached_message is not None:
+            pieces = [cached_message["content"]]
+            yield cached_message["content"]
+        else:
+            pieces = []
+            try:
+                stream = await self.aclient.chat.completions.create(
+                    **self._stream_request_kwargs(message_stack, response_format)
+                )
+                async for chunk in stream:
+                    piece = self._handle_stream_chunk(chunk, verbose)
+                    if piece:
+                        pieces.append(piece)
+                        yield piece
+            except Exception:
+                # Callers must be able to tell a failed stream from a complete one
+                logger.exception("An error occurred while streaming the message")
+                raise
+            response_message = Message(role="assistant", content="".join(pieces))
+            if cache_key is not None:
+                await self.cache.aset(cache_key, response_message)
+            self._semantic_cache_store(semantic_entry, response_message)
+
+        if save_message:
+            self.message_stack = [
+                *message_stack,
+                Message(role="assistant", content="".join(pieces)),
+            ]
+
+
+class BatchThread(Thread):
+    """Send independent prompts through the Batch API instead of the sync endpoint.
+
+    Batch requests are billed at a lower price but are completed asynchronously
+    (within `completion_window`), so this is meant for non-interactive jobs such as
+    grading or validating many invoices.
+    ref: https://learn.microsoft.com/en-us/azure/ai-services/openai/how-to/batch
+    """
+
+    completion_window = "24h"
+    # Seconds between two checks of the batch status
+    poll_interval = 60
+
+    def _build_batch_line(
+        self, custom_id: str, content: str, response_format: BaseModel | None = None
+    ) -> bytes:
+        body = {
+            "model": self.model,
+            "messages": [self.message_stack[0], Message(role="user", content=content)],
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+        }
+        if response_format is not None:
+            body["response_format"] = _response_format_param(response_format)
+        return orjson.dumps(
+            {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": body,
+            }
+        )
+
+    async def submit_batch(
+        self,
+        contents: list[str],
+        verbose: bool = False,
+        response_format: BaseModel | None = None,
+    ) -> list[Message | None]:
+        """Submit the user messages as one batch job and wait for the responses.
+
+        Each content is sent as its own conversation on top of the system prompt.
+
+        Args:
+            contents (list[str]): The user messages to send.
+            verbose (bool): Whether to print the token usage of each response.
+            response_format (BaseModel | None): Optional structured output format.
+
+        Returns:
+            list[Message | None]: The response messages, in the same order as
+            `contents`. None for the requests that failed.
+
+        Raises:
+            RuntimeError: If the batch job failed, expired or was cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        futures = {
+            f"request-{idx}": loop.create_future() for idx in range(len(contents))
+        }
+        batch_file = b"\n".join(
+            self._build_batch_line(custom_id, content, response_format)
+            for custom_id, content in zip(futures, contents)
+        )
+
+        try:
+            input_file = await self.aclient.files.create(
+                file=("batch.jsonl", batch_file), purpose="batch"
+            )
+            batch = await self.aclient.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/chat/completions",
+                completion_window=self.completion_window,
+            )
+            await self._dispatch_batch_results(batch.id, futures, verbose)
+        except Exception:
+            logger.exception("An error occurred while processing the batch")
+            raise
+
+        for future in futures.values():
+            if not future.done():
+                future.set_result(None)
+        return await asyncio.gather(*futures.values())
+
+    async def _dispatch_batch_results(
+        self, batch_id: str, futures: dict[str, asyncio.Future], verbose: bool = False
+    ):
+        """Poll the batch until it finishes and resolve the futures of its requests."""
+        batch = await self.aclient.batches.retrieve(batch_id)
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.aclient.batches.retrieve(batch_id)
+
+        if batch.status != "completed" or batch.output_file_id is None:
+            raise RuntimeError(f"Batch {batch_id} finished with status: {batch.status}")
+
+        output_file = await self.aclient.files.content(batch.output_file_id)
+        for line in output_file.text.splitlines():
+            if not line.strip():
+                continue
+            result = orjson.loads(line)
+            future = futures.get(result["custom_id"])
+            if future is None or future.done():
+                continue
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.warning(
+                    "Batch request %s failed: %s",
+                    result["custom_id"],
+                    result.get("error"),
+                )
+                future.set_result(None)
+                continue
+            completion = ChatCompletion.model_validate(response["body"])
+            future.set_result(self._handle_response(completion, verbose))
@@ -1,3 +1,66 @@
+import functools
+from string import Template
+
+import orjson
+
+_ITEMS_TABLE_HEADER = (
+    "| Item Name | Quantity | Unit Price | Tax Rate | Total |\n"
+    "|----------|----------|------------|----------|-------|\n"
+)
+
+# Layouts of the company info sections, compiled once at import
+_BUSINESS_DETAILS_TEMPLATE = Template(
+    "#### Business Details\n"
+    "**Name**: $business_name\n\n"
+    "**Address**: $business_address\n\n"
+    "**Contact**: $business_contact\n\n"
+)
+_CUSTOMER_TEMPLATE = Template(
+    "**Customer $index**: $customer_name\n\n"
+    "**Address**: $customer_address\n\n"
+    "**Contact**: $customer_contact\n\n"
+)
+
+
+def _fmt_money(value) -> str:
+    """Format float values as a euro amount, leave anything else (e.g. PLACEHOLDER) as is."""
+    return f"€{value:.2f}" if isinstance(value, float) else value
+
+
+def _cache_key(data) -> bytes:
+    return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+
+
+@functools.lru_cache(maxsize=64)
+def _format_company_items(item_list_json: bytes) -> str:
+    parts = [
+        "#### Available Items\n\n",
+        "| Item Name | Unit Price (Tax included)  | Tax Rate |\n",
+        "|----------|------------|----------|\n",
+    ]
+    parts.extend(
+        f"| {item.get('item_name', 'N/A')} | €{item.get('unit_price', 0):.2f} | {item.get('tax_rate', 0)}% |\n"
+        for item in orjson.loads(item_list_json)
+    )
+    parts.append("\n")
+    return "".join(parts)
+
+
+@functools.lru_cache(maxsize=64)
+def _format_company_customers(customer_list_json: bytes) -> str:
+    parts = ["#### Customers\n\n"]
+    parts.extend(
+        _CUSTOMER_TEMPLATE.substitute(
+            index=i,
+            customer_name=customer.get("customer_name", "N/A"),
+            customer_address=customer.get("customer_address", "N/A"),
+            customer_contact=customer.get("customer_contact", "N/A"),
+        )
+        for i, customer in enumerate(orjson.loads(customer_list_json), 1)
+    )
+    return "".join(parts)
+
+
 def format_company_info_as_markdown(company_data: dict) -> str:
     """Format company data as a readable markdown structure.
 
@@ -10,33 +73,27 @@ def format_company_info_as_markdown(company_data: dict) -> str:
     if not company_data:
         return "### Company does not exist"
 
-    markdown = ""
-
     # General Company Info
-    markdown += "#### Business Details\n"
-    markdown += f"**Name**: {company_data.get('business_name', 'N/A')}\n\n"
-    markdown += f"**Address**: {company_data.get('business_address', 'N/A')}\n\n"
-    markdown += f"**Contact**: {company_data.get('business_contact', 'N/A')}\n\n"
+    parts = [
+        _BUSINESS_DETAILS_TEMPLATE.substitute(
+            business_name=company_data.get("business_name", "N/A"),
+            business_address=company_data.get("business_address", "N/A"),
+            business_contact=company_data.get("business_contact", "N/A"),
+        )
+    ]
 
-    # Items
+    # Items and customers rarely change between renders of the same company, so their
+    # sections are memoized on the serialized content (which also invalidates them
+    # as soon as the content changes)
     if "item_list" in company_data and company_data["item_list"]:
-        markdown += "#### Available Items\n\n"
-        markdown += "| Item Name | Unit Price (Tax included)  | Tax Rate |\n"
-        markdown += "|----------|------------|----------|\n"
-
-        for item in company_data["item_list"]:
-            markdown += f"| {item.get('item_name', 'N/A')} | €{item.get('unit_price', 0):.2f} | {item.get('tax_rate', 0)}% |\n"
-        markdown += "\n"
+        parts.append(_format_company_items(_cache_key(company_data["item_list"])))
 
-    # Customers
     if "customer_list" in company_data and company_data["customer_list"]:
-        markdown += "#### Customers\n\n"
-        for i, customer in enumerate(company_data["customer_list"], 1):
-            markdown += f"**Customer {i}**: {customer.get('customer_name', 'N/A')}\n\n"
-            markdown += f"**Address**: {customer.get('customer_address', 'N/A')}\n\n"
-            markdown += f"**Contact**: {customer.get('customer_contact', 'N/A')}\n\n"
+        parts.append(
+            _format_company_customers(_cache_key(company_data["customer_list"]))
+        )
 
-    return markdown
+    return "".join(parts)
 
 
 def format_items_as_markdown_table(items: list) -> str:
@@ -51,35 +108,78 @@ def format_items_as_markdown_table(items: list) -> str:
     if not items:
         return "No relevant items found."
 
-    # Create table header
-    table = "| Item Name | Quantity | Unit Price | Tax Rate | Total |\n"
-    table += "|----------|----------|------------|----------|-------|\n"
-
-    # Add each item as a row
-    for item in items:
-        name = item.get("name", "")
-        quantity = item.get("quantity", "")
-        unit_price = (
-            f"€{item.get('unit_price', 0):.2f}"
-            if isinstance(item.get("unit_price"), float)
-            else item.get("unit_price")
-        )
-        tax_rate = (
-            f"€{item.get('tax_rate', 0):.2f}"
-            if isinstance(item.get("tax_rate"), float)
-            else item.get("tax_rate")
-        )
-        total = (
-            f"€{item.get('total_price', 0):.2f}"
-            if isinstance(item.get("total_price"), float)
-            else item.get("total_price")
-        )
-        table += f"| {name} | {quantity} | {unit_price} | {tax_rate} | {total} |\n"
+    rows = [
+        f"| {item.get('name', '')} | {item.get('quantity', '')} | {_fmt_money(item.get('unit_price'))} | {_fmt_money(item.get('tax_rate'))} | {_fmt_money(item.get('total_price'))} |\n"
+        for item in items
+    ]
+    return _ITEMS_TABLE_HEADER + "".join(rows)
+
+
+def _format_analysis(key: str, value, reasoning: dict) -> str:
+    # Handles the nested structure with analysis text and the item tables
+    if not isinstance(value, dict):
+        return _format_default(key, value, reasoning)
+
+    parts = ["#### Analysis\n"]
+
+    # Add the analysis text
+    if "analysis" in value:
+        parts.append(value["analysis"] + "\n\n")
+
+    # Add available items table (items from company database)
+    if "available_items" in value and value["available_items"]:
+        parts.append("**Available Items (From Company Database):**\n\n")
+        parts.append(format_items_as_markdown_table(value["available_items"]) + "\n\n")
+
+    # Add new items table (items to be added to database)
+    if "new_items" in value and value["new_items"]:
+        parts.append("**New Items (To Be Added to Database):**\n\n")
+        parts.append(format_items_as_markdown_table(value["new_items"]) + "\n\n")
+
+    return "".join(parts)
+
+
+# Sections of the boolean reasoning fields, which only have two possible renders
+_VALID_INVOICE_SECTION = "#### Invoice Request Status\n✅ Valid\n\n"
+_INVALID_INVOICE_SECTION = "#### Invoice Request Status\n❌ Invalid\n\n"
+_HAS_NEW_ITEMS_SECTION = "#### Item Status\n🆕 Has New Items\n\n"
+_NO_NEW_ITEMS_SECTION = "#### Item Status\n✅ All Items Available in Database\n\n"
+
+
+def _format_is_valid_invoice(key: str, value, reasoning: dict) -> str:
+    return _VALID_INVOICE_SECTION if value else _INVALID_INVOICE_SECTION
+
+
+def _format_has_new_items(key: str, value, reasoning: dict) -> str:
+    return _HAS_NEW_ITEMS_SECTION if value else _NO_NEW_ITEMS_SECTION
+
+
+def _format_decision_analysis(key: str, value, reasoning: dict) -> str:
+    return f"#### Decision Explanation\n{value}\n\n"
+
+
+def _format_calculations(key: str, value, reasoning: dict) -> str:
+    # Only shown if is_valid_invoice is true
+    if reasoning.get("is_valid_invoice", False):
+        return f"#### Calculations\n{value}\n\n"
+    return ""
+
+
+def _format_default(key: str, value, reasoning: dict) -> str:
+    return f"#### {key}\n{value}\n\n"
+
 
-    return table
+# Special handling of the reasoning fields, any other field uses _format_default
+_REASONING_FORMATTERS = {
+    "Analysis": _format_analysis,
+    "is_valid_invoice": _format_is_valid_invoice,
+    "has_new_items": _format_has_new_items,
+    "decision_analysis": _format_decision_analysis,
+    "Calculations": _format_calculations,
+}
 
 
-def format_reasoning_as_markdown(reasoning: dict, header: str = "") -> str:  # noqa: C901
+def format_reasoning_as_markdown(reasoning: dict, header: str = "") -> str:
     """Format the reasoning dictionary as Markdown with an optional header.
     Handles nested structure with Analysis containing analysis text and relevant_items.
     Also handles the refactored decision structure with is_valid_invoice and decision_analysis.
@@ -91,53 +191,9 @@ def format_reasoning_as_markdown(reasoning: dict, header: str = "") -> str:  # n
     Returns:
         str: The formatted reasoning in Markdown.
     """
-    markdown = f"### {header}\n\n" if header else ""
-
-    # Process each key in the reasoning dictionary
-    for key, value in reasoning.items():
-        # Special handling for Analysis if it has the nested structure
-        if key == "Analysis" and isinstance(value, dict):
-            markdown += "#### Analysis\n"
-
-            # Add the analysis text
-            if "analysis" in value:
-                markdown += value["analysis"] + "\n\n"
-
-            # Add available items table (items from company database)
-            if "available_items" in value and value["available_items"]:
-                markdown += "**Available Items (From Company Database):**\n\n"
-                markdown += (
-                    format_items_as_markdown_table(value["available_items"]) + "\n\n"
-                )
-
-            # Add new items table (items to be added to database)
-            if "new_items" in value and value["new_items"]:
-                markdown += "**New Items (To Be Added to Database):**\n\n"
-                markdown += format_items_as_markdown_table(value["new_items"]) + "\n\n"
-
-        # Special handling for is_valid_invoice (boolean)
-        elif key == "is_valid_invoice":
-            valid_status = "✅ Valid" if value else "❌ Invalid"
-            markdown += f"#### Invoice Request Status\n{valid_status}\n\n"
-
-        # Special handling for has_new_items (boolean)
-        elif key == "has_new_items":
-            items_status = (
-                "🆕 Has New Items" if value else "✅ All Items Available in Database"
-            )
-            markdown += f"#### Item Status\n{items_status}\n\n"
-
-        # Special handling for decision_analysis
-        elif key == "decision_analysis":
-            markdown += f"#### Decision Explanation\n{value}\n\n"
-
-        # Special handling for Calculations (only shown if is_valid_invoice is true)
-        elif key == "Calculations":
-            if reasoning.get("is_valid_invoice", False):
-                markdown += f"#### Calculations\n{value}\n\n"
-
-        # Standard handling for any other fields
-        else:
-            markdown += f"#### {key}\n{value}\n\n"
-
-    return markdown
+    parts = [f"### {header}\n\n"] if header else []
+    parts.extend(
+        _REASONING_FORMATTERS.get(key, _format_default)(key, value, reasoning)
+        for key, value in reasoning.items()
+    )
+    return "".join(parts)
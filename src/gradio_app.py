@@ -1,35 +1,112 @@
-import json
+import asyncio
+import contextlib
+import functools
+import hashlib
+import html
 import logging
 import logging.config
 import os
+import threading
 import time
-import uuid
+from collections import Counter
+from collections.abc import AsyncIterator, Iterable
 from datetime import datetime
+from string import Template
 
 import gradio as gr
+import orjson
 import redis
+from dotenv import load_dotenv
 
-from chat_llm import Thread
+from chat_llm import Thread, aclose_http_clients, close_http_clients
 from formats import format_company_info_as_markdown, format_reasoning_as_markdown
 from logger_config import base_log_config
-from schema import LLMResponse, NewInvoiceItem
-from styles import INVOICE_STYLES
+from schema import LLMResponse
+from styles import INVOICE_CSS
 from utils import extract_reasoning_and_invoice, get_project_version, load_system_prompt
 
+load_dotenv()  # Load environment variables from .env file
+
+# Redis connection settings, read once at import
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "password")
+# Seconds to wait for connecting to Redis and for each reply, so that an unreachable
+# server fails the request instead of blocking it
+REDIS_SOCKET_TIMEOUT = 5
+
+# Delay in seconds between scheduling an app reset and executing it
+RESET_DELAY = 5
+# Minimum seconds between two updates of the reasoning while the response is streamed
+STREAM_UPDATE_INTERVAL = 0.1
+# Number of events each handler works on at once, and how many may wait in the queue
+QUEUE_CONCURRENCY_LIMIT = 8
+QUEUE_MAX_SIZE = 64
+
+# The system prompt is static for the lifetime of the process, load it once
+SYS_PROMPT = load_system_prompt("src/system_prompt.txt")
+
 # Setup logger for this module
 logging.config.dictConfig(base_log_config)
 logger = logging.getLogger(__name__)
 
-# Initialize global variables
-# thread = None
-current_invoice_json = None  # Store the current invoice JSON for editing
-
-# Global variables to store available items (from database) and new items (to be added to database) with IDs
-available_items_global = []
-new_items_global = {}
-
-# Global variables to track saved items to avoid duplicates
-saved_items_global = set()  # Track IDs of items already saved to database
+# All the per-user state (thread, available and new items, current invoice,
+# saved item IDs) lives in the Gradio session state, never in module globals, so
+# concurrent sessions and multiple workers do not leak into each other
+
+# Fields of the company hashes in Redis (see redis_importer/mock_data.json),
+# and the ones among them stored as JSON strings
+COMPANY_FIELDS = (
+    "company_id",
+    "business_name",
+    "business_address",
+    "business_contact",
+    "item_list",
+    "customer_list",
+)
+COMPANY_JSON_FIELDS = frozenset({"item_list", "customer_list"})
+
+# Fields of a new item the user can edit
+ITEM_FIELDS = ("name", "quantity", "unit_price", "tax_rate")
+
+# Numeric fields of a new item and their types
+NUMERIC_ITEM_FIELDS = {"quantity": int, "unit_price": float, "tax_rate": float}
+
+# Item values that still need user input
+MISSING_VALUES = frozenset({"PLACEHOLDER", "", None})
+
+# Session state keys kept when the app is reset, any other key is removed
+SESSION_STATE_KEYS = frozenset(
+    {
+        "thread",
+        "available_items",
+        "new_items_dict",
+        "current_invoice",
+        "saved_items",
+        "reset_at",
+    }
+)
+
+# Shown instead of the reasoning when the LLM request failed
+LLM_ERROR_MESSAGE = "Failed to generate the invoice, please try again."
+
+# Attempts of the item list transaction before giving up on concurrent writes
+SAVE_MAX_ATTEMPTS = 5
+
+# Short-lived in-process caches of the company data, of its markdown and of its
+# pretty-printed LLM context, keyed by company ID. Nearly every UI event displays
+# the company info, so this avoids going back to Redis for each of them. Entries are
+# dropped when items are saved.
+COMPANY_CACHE_TTL = 5  # seconds
+COMPANY_CACHE_MAXSIZE = 128
+_company_data_cache = {}
+_company_info_cache = {}
+_company_context_cache = {}
+_company_cache_lock = threading.Lock()
+
+# Session state keys of the company data and markdown stashed per session, with the
+# company ID and the same TTL
+SESSION_COMPANY_KEYS = ("company_data", "company_info")
 
 # CONFIRM BUTTON VISIBILITY LOGIC:
 # The confirm button is shown only when ALL of the following conditions are met:
@@ -52,6 +129,83 @@ saved_items_global = set()  # Track IDs of items already saved to database
 # has complete context about the current invoice state when processing follow-up requests.
 
 
+def _dumps(obj) -> str:
+    """Serialize to a JSON string with orjson (numpy values coming from DataFrame edits included)."""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def _dumps_pretty(obj) -> str:
+    """Serialize to an indented JSON string with orjson."""
+    return orjson.dumps(
+        obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+    ).decode()
+
+
+def _cache_get(cache: dict, key: str):
+    """Get a value from one of the company caches, None if missing or expired."""
+    with _company_cache_lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del cache[key]
+            return None
+        return value
+
+
+def _cache_set(cache: dict, key: str, value) -> None:
+    """Store a value in one of the company caches, evicting the oldest entry when full."""
+    with _company_cache_lock:
+        cache.pop(key, None)
+        if len(cache) >= COMPANY_CACHE_MAXSIZE:
+            del cache[next(iter(cache))]
+        cache[key] = (time.monotonic() + COMPANY_CACHE_TTL, value)
+
+
+def clear_company_cache(company_id: str | None = None) -> None:
+    """Drop the cached data of a company, or of all companies if no ID is given.
+
+    Args:
+        company_id (str | None): The ID of the company.
+    """
+    with _company_cache_lock:
+        for cache in (_company_data_cache, _company_info_cache, _company_context_cache):
+            if company_id is None:
+                cache.clear()
+            else:
+                cache.pop(company_id, None)
+
+
+@functools.cache
+def get_redis_client(
+    host: str = REDIS_HOST, port: int = REDIS_PORT, password: str = REDIS_PASSWORD
+) -> redis.StrictRedis:
+    """Get a Redis client for the given server, backed by a shared connection pool.
+
+    The client is created once per server, so every call reuses pooled connections
+    instead of paying the TCP connect and AUTH round-trips again.
+
+    Args:
+        host (str): The Redis host, REDIS_HOST by default.
+        port (int): The Redis port, REDIS_PORT by default.
+        password (str): The Redis password, REDIS_PASSWORD by default.
+
+    Returns:
+        redis.StrictRedis: The pooled Redis client.
+    """
+    pool = redis.ConnectionPool(
+        host=host,
+        port=port,
+        password=password,
+        decode_responses=True,
+        max_connections=32,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+    )
+    return redis.StrictRedis(connection_pool=pool)
+
+
 def get_data_from_redis(company_id: str) -> dict:
     """Retrieve data from Redis for a given company ID.
 
@@ -61,109 +215,177 @@ def get_data_from_redis(company_id: str) -> dict:
     Returns:
         dict: Data retrieved from Redis.
     """
-    redis_host = os.getenv("REDIS_HOST", "localhost")
-    redis_port = int(os.getenv("REDIS_PORT", 6379))
-    redis_password = os.getenv("REDIS_PASSWORD", "password")
+    company_data = _cache_get(_company_data_cache, company_id)
+    if company_data is not None:
+        return company_data
 
     try:
-        client = redis.StrictRedis(
-            host=redis_host,
-            port=redis_port,
-            password=redis_password,
-            decode_responses=True,
-        )
-        client.ping()
-        # logger.info("Connected to Redis")
-
-        # Retrieve data from Redis
-        company_data = client.hgetall(f"company:{company_id}")
+        client = get_redis_client()
+
+        # Retrieve only the known fields from Redis
+        values = client.hmget(f"company:{company_id}", COMPANY_FIELDS)
+        company_data = {
+            key: value
+            for key, value in zip(COMPANY_FIELDS, values, strict=True)
+            if value is not None
+        }
         if not company_data:
             return None
 
         # Convert JSON strings back to Python objects
-        for key, value in company_data.items():
+        for key in COMPANY_JSON_FIELDS & company_data.keys():
             try:
-                company_data[key] = json.loads(value)
-            except json.JSONDecodeError:
+                company_data[key] = orjson.loads(company_data[key])
+            except orjson.JSONDecodeError:
                 pass
 
+        _cache_set(_company_data_cache, company_id, company_data)
         return company_data
 
     except redis.ConnectionError as e:
-        print(f"Failed to connect to Redis: {e}")
+        logger.error("Failed to connect to Redis: %s", e)
     except Exception as e:
-        print(f"An error occurred: {e}")
+        logger.error("An error occurred: %s", e)
+
+
+def _session_cache_get(session_state: dict | None, key: str, company_id: str):
+    """Get a company value stashed in the session state, None if it is missing, stale
+    or for another company."""
+    if session_state is None:
+        return None
+    stashed = session_state.get(key)
+    if stashed and stashed[0] == company_id and time.monotonic() < stashed[1]:
+        return stashed[2]
+    return None
+
+
+def _session_cache_set(
+    session_state: dict | None, key: str, company_id: str, value
+) -> None:
+    """Stash a company value in the session state for COMPANY_CACHE_TTL seconds."""
+    if session_state is not None:
+        session_state[key] = (company_id, time.monotonic() + COMPANY_CACHE_TTL, value)
+
+
+def _clear_session_company_cache(session_state: dict) -> None:
+    """Drop the company values stashed in the session state, e.g. after saving items."""
+    for key in SESSION_COMPANY_KEYS:
+        session_state.pop(key, None)
+
+
+def _get_company_data(company_id: str, session_state: dict | None = None) -> dict:
+    """Get the company data, reusing the copy stashed in the session state if it is
+    for the same company and still fresh.
+
+    Args:
+        company_id (str): The ID of the company.
+        session_state (dict | None): The session state.
+
+    Returns:
+        dict: The company data.
+    """
+    company_data = _session_cache_get(session_state, "company_data", company_id)
+    if company_data is not None:
+        return company_data
+
+    company_data = get_data_from_redis(company_id)
+    if company_data:
+        _session_cache_set(session_state, "company_data", company_id, company_data)
+    return company_data
 
 
-def generate_invoice(
+def _get_company_context(company_id: str, company_data: dict) -> str:
+    """Get the company info passed to the LLM, pretty-printing the company data only
+    once for consecutive turns.
+
+    Args:
+        company_id (str): The ID of the company.
+        company_data (dict): The company data.
+
+    Returns:
+        str: The company info for the LLM.
+    """
+    company_context = _cache_get(_company_context_cache, company_id)
+    if company_context is None:
+        company_context = f"Company Info:\n{_dumps_pretty(company_data)}"
+        _cache_set(_company_context_cache, company_id, company_context)
+    return company_context
+
+
+def _build_invoice_input(
     company_id: str, input_message: str, session_state: dict
-) -> tuple[str, str, Thread]:
-    """Generate an invoice using the LLM based on the company ID and input message.
+) -> str | None:
+    """Build the user message of an invoice request, with the current date and the
+    company info.
 
     Args:
         company_id (str): The ID of the company.
         input_message (str): The input message from the user.
+        session_state (dict): The session state.
 
     Returns:
-        Tuple[str, str, Thread]: The reasoning, generated invoice, and the Thread instance.
+        str | None: The user message, None if the company does not exist.
     """
     thread = session_state["thread"]
-    logger.info(f"Current token usage: {thread.total_tokens}")
     # Get data from Redis
-    company_data = get_data_from_redis(company_id)
+    company_data = _get_company_data(company_id, session_state)
     if not company_data:
-        return "Company does not exist", "", None
+        return None
 
     # Combine the input message with company info
     current_date = datetime.now().strftime("%Y-%m-%d")
 
-    user_input = f"{input_message}\n\nCurrent Date: {current_date}\n\nCompany Info:\n{json.dumps(company_data, indent=2)}"
-    # print(user_input)
-
-    # # Load the system prompt from the file
-    # sys_prompt = load_system_prompt("src/system_prompt.txt")
-
-    # # Initialize the Thread with the system prompt
-    # thread = Thread(sys_prompt=sys_prompt)
-
-    # Call the LLM and get the response
-    response = thread.send_message(
-        content=user_input,
-        save_message=True,
-        show_all=False,
-        verbose=True,
-        response_format=LLMResponse,
-    )
-    logger.info(f"Current token usage after user input: {thread.total_tokens}")
+    # Company info is static for a conversation: keep it in the system message so it
+    # is part of the cached prompt prefix, unless the conversation already started
+    # with a different company
+    company_context = _get_company_context(company_id, company_data)
+    if len(thread.message_stack) == 1:
+        thread.set_static_context(company_context)
+    user_input = f"{input_message}\n\nCurrent Date: {current_date}"
+    if thread.static_context != company_context:
+        user_input += f"\n\n{company_context}"
+    return user_input
 
-    # Extract reasoning and invoice from the response
-    reasoning, invoice = extract_reasoning_and_invoice(response["content"])
 
-    return reasoning, invoice, thread
-
-
-def display_company_info(company_id: str) -> str:
+def display_company_info(company_id: str, session_state: dict | None = None) -> str:
     """Display company information based on the company ID.
 
     Args:
         company_id (str): The ID of the company.
+        session_state (dict | None): The session state, whose company data and
+            markdown are reused.
 
     Returns:
         str: The company information in Markdown format.
     """
     # logger.info(f"Displaying company info for company ID: {company_id}")
-    company_data = get_data_from_redis(company_id)
+    company_info = _session_cache_get(session_state, "company_info", company_id)
+    if company_info is not None:
+        return company_info
+
+    company_info = _cache_get(_company_info_cache, company_id)
+    if company_info is not None:
+        _session_cache_set(session_state, "company_info", company_id, company_info)
+        return company_info
+
+    company_data = _get_company_data(company_id, session_state)
     # logger.info(f"Company data: {company_data}")
     if not company_data:
         return "### Company does not exist"
 
-    return format_company_info_as_markdown(company_data)
+    company_info = format_company_info_as_markdown(company_data)
+    _cache_set(_company_info_cache, company_id, company_info)
+    _session_cache_set(session_state, "company_info", company_id, company_info)
+    return company_info
 
 
 def assign_ids_to_new_items(new_items: list) -> dict:
     """
     Assign unique IDs to new items that need to be added to the database.
 
+    The IDs are derived from the normalized item names, so that the same item keeps
+    its ID across the follow-up turns. Items with the same name get a numbered suffix.
+
     Args:
         new_items: List of new items that don't exist in company database
 
@@ -172,174 +394,164 @@ def assign_ids_to_new_items(new_items: list) -> dict:
     """
     result = {}
     for item in new_items:
-        id = str(uuid.uuid4())
-        result[id] = item
+        name = str(item.get("name", "")).lower().strip()
+        item_id = base_id = hashlib.blake2b(name.encode(), digest_size=6).hexdigest()
+        suffix = 1
+        while item_id in result:
+            suffix += 1
+            item_id = f"{base_id}-{suffix}"
+        result[item_id] = item
     return result
 
 
-def get_invoice_html(  # noqa: C901
-    invoice_json: str, available_items: list, new_items_dict: dict
-) -> str:
+def _to_number_or_placeholder(value, number_type: type):
+    """Convert a value to the given number type, PLACEHOLDER if missing or invalid."""
+    if value in MISSING_VALUES:
+        return "PLACEHOLDER"
+    try:
+        return number_type(value)
+    except (ValueError, TypeError):
+        return "PLACEHOLDER"
+
+
+def _coerce_new_item(item: dict) -> dict:
     """
-    Generate invoice HTML combining available items (from database) and new items (to be added).
+    Convert the values of a new item, possibly edited by the user in the DataFrame, to
+    their proper types. Values that are missing or cannot be converted become PLACEHOLDER.
 
     Args:
-        invoice_json: Base invoice JSON string
-        available_items: List of items that exist in company database
-        new_items_dict: Dictionary of new items that need to be added to database
+        item: The new item data
 
     Returns:
-        Tuple of (invoice_data_dict, invoice_html_string)
+        The new item as a dictionary, with quantity as int, unit_price and tax_rate as float
+        and total_price computed, or PLACEHOLDER for any of them
     """
-    # Compose invoice JSON for preview: combine available and new items
-    try:
-        invoice_data = json.loads(invoice_json)
-    except Exception:
-        invoice_data = {}
-    # Convert new items with proper type handling for user edits
-    new_items_list = []
-    for item in new_items_dict.values():
-        # Ensure proper type conversion for edited values from DataFrame
-        processed_item = item.copy()
-        logger.info(f"processed_item: {json.dumps(processed_item, indent=2)}")
-
-        # Handle quantity conversion
-        if processed_item.get("quantity") not in ["PLACEHOLDER", "", None]:
-            try:
-                processed_item["quantity"] = int(processed_item["quantity"])
-            except (ValueError, TypeError):
-                processed_item["quantity"] = "PLACEHOLDER"
-        else:
-            processed_item["quantity"] = "PLACEHOLDER"
-
-        # Handle unit_price conversion
-        if processed_item.get("unit_price") not in ["PLACEHOLDER", "", None]:
-            try:
-                processed_item["unit_price"] = float(processed_item["unit_price"])
-            except (ValueError, TypeError):
-                processed_item["unit_price"] = "PLACEHOLDER"
-        else:
-            processed_item["unit_price"] = "PLACEHOLDER"
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("processed_item: %s", _dumps(item))
+
+    # Ensure proper type conversion for edited values from DataFrame
+    quantity = _to_number_or_placeholder(item.get("quantity"), int)
+    unit_price = _to_number_or_placeholder(item.get("unit_price"), float)
+    tax_rate = _to_number_or_placeholder(item.get("tax_rate"), float)
+
+    # Compute total price for new item
+    total_price = (
+        float(quantity) * unit_price
+        if quantity != "PLACEHOLDER" and unit_price != "PLACEHOLDER"
+        else "PLACEHOLDER"
+    )
 
-        # Handle tax_rate conversion
-        if processed_item.get("tax_rate") not in ["PLACEHOLDER", "", None]:
-            try:
-                processed_item["tax_rate"] = float(processed_item["tax_rate"])
-            except (ValueError, TypeError):
-                processed_item["tax_rate"] = "PLACEHOLDER"
-        else:
-            processed_item["tax_rate"] = "PLACEHOLDER"
+    # Same fields as NewInvoiceItem, built directly since the values are converted
+    return {
+        "name": item.get("name", "PLACEHOLDER"),
+        "quantity": quantity,
+        "unit_price": unit_price,
+        "tax_rate": tax_rate,
+        "total_price": total_price,
+        "is_new_item": True,
+    }
 
-        # Ensure is_new_item is set
-        processed_item["is_new_item"] = True
 
-        try:
-            try:
-                # Compute total price for new item
-                total_price = float(processed_item["quantity"]) * float(
-                    processed_item["unit_price"]
-                )
-                processed_item["total_price"] = total_price
-            except Exception as e:
-                logger.error(f"Error computing total price for new item: {e}")
-                processed_item["total_price"] = "PLACEHOLDER"
-
-            # Create NewInvoiceItem object and convert to dict
-            new_item_obj = NewInvoiceItem(**processed_item)
-            new_items_list.append(new_item_obj.model_dump())
-        except Exception as e:
-            logger.error(
-                f"Error creating NewInvoiceItem: {e}, using processed_item directly"
-            )
-            new_items_list.append(processed_item)
+def _compute_invoice_totals(available_items: list, new_items: list) -> tuple:
+    """
+    Compute the subtotal, tax and total due of an invoice.
 
-    # print("new_items_list:", new_items_list)
-    invoice_data["items"] = available_items + new_items_list
+    Args:
+        available_items: List of items that exist in company database
+        new_items: List of new items, already converted by _coerce_new_item
 
-    # Recalculate totals
-    subtotal = sum([item.get("total_price", 0) for item in available_items])
-    tax = sum(
-        [
-            item.get("total_price", 0) * item.get("tax_rate", 0) / 100
-            for item in available_items
-        ]
-    )
-    total_due = subtotal + tax
+    Returns:
+        Tuple of (subtotal, tax, total_due), all PLACEHOLDER if any new item is incomplete
+    """
+    # Accumulate subtotal and tax in a single pass
+    subtotal = tax = 0
+    for item in available_items:
+        total_price = item.get("total_price", 0) or 0
+        subtotal += total_price
+        tax += total_price * (item.get("tax_rate", 0) or 0) / 100
 
-    for item in invoice_data["items"][len(available_items) :]:
+    for item in new_items:
         # Check if any new item still has PLACEHOLDER values
         # If any item has a "PLACEHOLDER" value, set all totals to "PLACEHOLDER"
         # This indicates the invoice is not yet complete (new items need user input)
         # Exclude 'is_new_item' field from PLACEHOLDER check
-        item_values_to_check = {k: v for k, v in item.items() if k != "is_new_item"}
-        if "PLACEHOLDER" in list(item_values_to_check.values()):
-            subtotal = tax = total_due = "PLACEHOLDER"
-            break
-
-        # Enhanced type conversion with better error handling
-        quantity = item.get("quantity", 0)
-        unit_price = item.get("unit_price", 0)
-        tax_rate = item.get("tax_rate", 0)
-
-        # Convert quantity to integer
-        if isinstance(quantity, str) and quantity.strip():
-            try:
-                quantity = int(float(quantity))  # Handle cases like "5.0"
-                item["quantity"] = quantity
-            except (ValueError, TypeError) as e:
-                logger.error(f"Error converting quantity '{quantity}' to int: {e}")
-                quantity = 0
-        elif not isinstance(quantity, int | float):
-            quantity = 0
-
-        # Convert unit_price to float
-        if isinstance(unit_price, str) and unit_price.strip():
-            try:
-                unit_price = float(unit_price)
-                item["unit_price"] = unit_price
-            except (ValueError, TypeError) as e:
-                logger.error(
-                    f"Error converting unit_price '{unit_price}' to float: {e}"
-                )
-                unit_price = 0.0
-        elif not isinstance(unit_price, int | float):
-            unit_price = 0.0
+        if any(v == "PLACEHOLDER" for k, v in item.items() if k != "is_new_item"):
+            return "PLACEHOLDER", "PLACEHOLDER", "PLACEHOLDER"
 
-        # Convert tax_rate to float
-        if isinstance(tax_rate, str) and tax_rate.strip():
-            try:
-                tax_rate = float(tax_rate)
-                item["tax_rate"] = tax_rate
-            except (ValueError, TypeError) as e:
-                logger.error(f"Error converting tax_rate '{tax_rate}' to float: {e}")
-                tax_rate = 0.0
-        elif not isinstance(tax_rate, int | float):
-            tax_rate = 0.0
-
-        # Calculate total price for new item
-        total_price = float(quantity) * float(unit_price)
-        item["total_price"] = total_price
-
-        # Add to running totals
+        # Without PLACEHOLDER values, the item values are already numbers and
+        # total_price is quantity × unit_price
+        total_price = item["total_price"]
         subtotal += total_price
-        tax += total_price * float(tax_rate) / 100.0
-
-        logger.info(
-            f"Calculated new item: {item.get('name')} - Qty:{quantity} × €{unit_price} = €{total_price} (Tax: {tax_rate}%)"
+        tax += total_price * item["tax_rate"] / 100.0
+
+        logger.debug(
+            "Calculated new item: %s - Qty:%s × €%s = €%s (Tax: %s%%)",
+            item.get("name"),
+            item["quantity"],
+            item["unit_price"],
+            total_price,
+            item["tax_rate"],
         )
-    total_due = subtotal + tax if total_due != "PLACEHOLDER" else "PLACEHOLDER"
+
+    return subtotal, tax, subtotal + tax
+
+
+def get_invoice_html(
+    invoice: dict | str, available_items: list, new_items_dict: dict
+) -> tuple[dict, str]:
+    """
+    Generate invoice HTML combining available items (from database) and new items (to be added).
+
+    Args:
+        invoice: Base invoice, as a dictionary or a JSON string. It is not modified.
+        available_items: List of items that exist in company database
+        new_items_dict: Dictionary of new items that need to be added to database
+
+    Returns:
+        Tuple of (invoice_data_dict, invoice_html_string), the dictionary being an
+        updated copy of the invoice with the combined items and recalculated totals
+    """
+    # Compose invoice for preview: combine available and new items. A dictionary is
+    # copied since it may be the current invoice held in the session state
+    if isinstance(invoice, dict):
+        invoice_data = dict(invoice)
+    else:
+        try:
+            invoice_data = orjson.loads(invoice)
+        except Exception:
+            invoice_data = {}
+    # Convert new items with proper type handling for user edits
+    new_items_list = [_coerce_new_item(item) for item in new_items_dict.values()]
+
+    invoice_data["items"] = available_items + new_items_list
+
+    # Recalculate totals
+    subtotal, tax, total_due = _compute_invoice_totals(available_items, new_items_list)
     invoice_data["subtotal"] = subtotal
     invoice_data["tax"] = tax
     invoice_data["total_due"] = total_due
-    # print("invoice_data:", invoice_data)
-    invoice_html = format_invoice_as_html(json.dumps(invoice_data))
-    return invoice_data, invoice_html
+
+    # Follow-ups and re-applied edits often leave the invoice unchanged, so the HTML
+    # is memoized on the serialized content
+    try:
+        invoice_json = orjson.dumps(
+            invoice_data, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    except orjson.JSONEncodeError:
+        return invoice_data, format_invoice_as_html(invoice_data)
+    return invoice_data, _format_invoice_as_html_cached(invoice_json)
+
+
+@functools.lru_cache(maxsize=32)
+def _format_invoice_as_html_cached(invoice_json: bytes) -> str:
+    return format_invoice_as_html(invoice_json.decode())
 
 
-def get_reasoning_and_invoice(
+async def get_reasoning_and_invoice(
     company_id: str, input_message: str, session_state: dict, header: str = ""
-) -> tuple[str, str, gr.update, gr.update, gr.update, gr.update, list | None]:
-    """Update the reasoning output first and then the invoice output after a delay.
+) -> AsyncIterator[tuple]:
+    """Stream the response of the LLM into the reasoning output while it is generated,
+    then show the formatted reasoning and the invoice.
 
     Args:
         company_id (str): The ID of the company.
@@ -347,16 +559,87 @@ def get_reasoning_and_invoice(
         session_state (dict): The session state.
         header (str): The header to be displayed at the beginning of the reasoning.
 
-    Returns:
+    Yields:
         Tuple: The reasoning markdown, formatted invoice HTML, update objects for showing results,
         hiding loading message, showing follow-up group, showing confirmation group,
         and the list of unclear items for the DataFrame if there are any.
     """
-    # logger.info(f"User input to generate invoice: {input_message}")
-    reasoning, invoice, _ = generate_invoice(company_id, input_message, session_state)
-    # logger.info("LLM call completed")
-    # logger.info(f"session_state['thread'].total_tokens: {session_state['thread'].total_tokens}")
-    reasoning_json = json.loads(reasoning)
+    # Show the loading message and hide the previous results first
+    yield (
+        gr.skip(),
+        gr.skip(),
+        gr.update(visible=False),  # Hide results row
+        gr.update(visible=True),  # Show loading message
+        gr.update(visible=False),  # Hide follow-up group
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+    )
+
+    thread = session_state["thread"]
+    logger.info("Current token usage: %s", thread.total_tokens)
+    # The company data may be read from Redis, which blocks, so keep it off the loop
+    user_input = await asyncio.to_thread(
+        _build_invoice_input, company_id, input_message, session_state
+    )
+    if user_input is None:
+        yield (
+            "Company does not exist",
+            "",
+            gr.update(visible=True),  # Show results row
+            gr.update(visible=False),  # Hide loading message
+            gr.update(visible=False),  # Hide follow-up group
+            gr.update(visible=False),  # Hide confirmation group
+            gr.update(visible=False),  # Hide new items group
+            None,
+        )
+        return
+
+    # Show the raw response as it is generated, at most every STREAM_UPDATE_INTERVAL
+    pieces = []
+    shown_at = 0.0
+    try:
+        async for piece in thread.async_send_message_stream(
+            content=user_input,
+            save_message=True,
+            verbose=True,
+            response_format=LLMResponse,
+        ):
+            pieces.append(piece)
+            now = time.monotonic()
+            if now - shown_at >= STREAM_UPDATE_INTERVAL:
+                shown_at = now
+                yield (
+                    f"```json\n{''.join(pieces)}\n```",
+                    gr.skip(),
+                    gr.update(visible=True),  # Show results row
+                    gr.update(visible=False),  # Hide loading message
+                    gr.skip(),
+                    gr.skip(),
+                    gr.skip(),
+                    gr.skip(),
+                )
+        # An empty or truncated response fails the validation
+        reasoning_json, invoice = extract_reasoning_and_invoice("".join(pieces))
+    except Exception as e:
+        logger.error("Failed to generate the invoice: %s", e)
+        yield (
+            LLM_ERROR_MESSAGE,
+            "",
+            gr.update(visible=True),  # Show results row
+            gr.update(visible=False),  # Hide loading message
+            gr.update(visible=False),  # Hide follow-up group
+            gr.update(visible=False),  # Hide confirmation group
+            gr.update(visible=False),  # Hide new items group
+            None,
+        )
+        return
+    logger.info(
+        "Current token usage after user input: %s (%s cached prompt tokens)",
+        thread.total_tokens,
+        thread.total_cached_prompt_tokens,
+    )
+
     reasoning_markdown = format_reasoning_as_markdown(reasoning_json, header)
 
     # Extract available items (from database) and new items (to be added to database)
@@ -367,8 +650,8 @@ def get_reasoning_and_invoice(
     session_state["available_items"] = available_items
     session_state["new_items_dict"] = new_items_dict
 
-    print("available_items:", available_items)
-    logger.info(f"new_items_dict: {json.dumps(new_items_dict, indent=2)}")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("new_items_dict: %s", _dumps(new_items_dict))
 
     invoice_data, invoice_html = get_invoice_html(
         invoice, available_items, new_items_dict
@@ -387,21 +670,13 @@ def get_reasoning_and_invoice(
     new_items_df = None
     if has_new_items:
         # Prepare DataFrame data for new items that need to be added to database
-        new_items_df = [
-            [
-                new_items_dict[item].get("name", ""),
-                new_items_dict[item].get("quantity", ""),
-                new_items_dict[item].get("unit_price", ""),
-                new_items_dict[item].get("tax_rate", ""),
-            ]
-            for item in new_items_dict
-        ]
+        new_items_df = extract_new_items_for_df(new_items_dict.values())
 
-    # Store the original invoice JSON for later use with the DataFrame
-    session_state["current_invoice_json"] = json.dumps(invoice_data)
+    # Store the invoice for later use with the DataFrame
+    session_state["current_invoice"] = invoice_data
 
-    # Return updates to show results and hide loading
-    return (
+    # Show results and hide loading
+    yield (
         reasoning_markdown,
         invoice_html,
         gr.update(visible=True),  # Show results row
@@ -417,105 +692,203 @@ def get_reasoning_and_invoice(
     )
 
 
+def _load_item_list(client: redis.StrictRedis, company_id: str) -> list | None:
+    """Load the item list of a company from Redis.
+
+    Args:
+        client (redis.StrictRedis): The Redis client
+        company_id (str): The ID of the company
+
+    Returns:
+        list | None: The item list, None if the company does not exist
+    """
+    item_list = client.hget(f"company:{company_id}", "item_list")
+    if item_list is None:
+        return [] if client.exists(f"company:{company_id}") else None
+
+    try:
+        return orjson.loads(item_list)
+    except orjson.JSONDecodeError:
+        return []
+
+
 def save_item_to_database(company_id: str, item_data: dict) -> bool:
     """
     Save a single new item to the company's database in Redis.
 
     Args:
         company_id (str): The ID of the company
-        item_data (dict): The item data to save
+        item_data (dict): The item data to save, only read
 
     Returns:
         bool: True if saved successfully, False otherwise
     """
-    redis_host = os.getenv("REDIS_HOST", "localhost")
-    redis_port = int(os.getenv("REDIS_PORT", 6379))
-    redis_password = os.getenv("REDIS_PASSWORD", "password")
-
     try:
-        client = redis.StrictRedis(
-            host=redis_host,
-            port=redis_port,
-            password=redis_password,
-            decode_responses=True,
+        saved_ids = _save_new_items(company_id, {"item": item_data})
+    except Exception as e:
+        logger.error("Error saving item to database: %s", e)
+        return False
+
+    if saved_ids:
+        logger.info(
+            "Successfully saved item '%s' to company %s database",
+            item_data.get("name", ""),
+            company_id,
         )
-        client.ping()
+    return bool(saved_ids)
 
-        # Get current company data
-        company_data = client.hgetall(f"company:{company_id}")
-        if not company_data:
-            print(f"Company {company_id} not found")
-            return False
 
-        # Parse existing item_list
-        current_items = []
-        if "item_list" in company_data:
-            try:
-                current_items = json.loads(company_data["item_list"])
-            except json.JSONDecodeError:
-                current_items = []
-
-        print("current_items:", current_items)
-        print("item_data:", item_data)
-        # Create new item for database (remove is_new_item field and ensure proper types)
-        new_item = {
-            "item_name": item_data.get("name", ""),
-            "unit_price": float(item_data.get("unit_price", 0)),
-            "tax_rate": float(item_data.get("tax_rate", 0)),
-        }
-        print("new_item:", new_item)
-        # Check if item already exists (by name)
-        item_exists = any(
-            existing_item.get("item_name", "").lower().strip()
-            == new_item["item_name"].lower().strip()
-            for existing_item in current_items
-        )
+def _append_new_items(current_items: list, pending_items: dict) -> list:
+    """Append the pending items missing from the item list of a company.
 
-        if item_exists:
-            print(f"Item '{new_item['item_name']}' already exists in database")
-            return False
+    Args:
+        current_items (list): The item list of the company, appended to in place
+        pending_items (dict): Dictionary of item IDs to item data
+
+    Returns:
+        list: IDs of the appended items
+    """
+    added_ids = []
+    existing_names = {
+        item.get("item_name", "").casefold().strip() for item in current_items
+    }
+    for item_id, item_data in pending_items.items():
+        try:
+            new_item = {
+                "item_name": item_data.get("name", ""),
+                "unit_price": float(item_data.get("unit_price", 0)),
+                "tax_rate": float(item_data.get("tax_rate", 0)),
+            }
+        except (TypeError, ValueError) as e:
+            logger.warning("Invalid item data for %s: %s", item_id, e)
+            continue
+
+        # Also catches duplicates within the same batch, casefold matches e.g. ß and ss
+        item_name = new_item["item_name"].casefold().strip()
+        if item_name in existing_names:
+            logger.warning(
+                "Item '%s' already exists in database", new_item["item_name"]
+            )
+            continue
 
-        # Add new item to the list
         current_items.append(new_item)
+        existing_names.add(item_name)
+        added_ids.append(item_id)
 
-        # Save updated item_list back to Redis
-        client.hset(f"company:{company_id}", "item_list", json.dumps(current_items))
+    return added_ids
 
-        print(
-            f"Successfully saved item '{new_item['item_name']}' to company {company_id} database"
-        )
-        return True
 
-    except Exception as e:
-        print(f"Error saving item to database: {e}")
-        return False
+def _save_new_items(company_id: str, pending_items: dict) -> list:
+    """Append the pending items to the item list of a company in one transaction.
 
+    The company key is watched, so that the read and the write of the item list are
+    retried if the list is changed concurrently, instead of losing the other write.
+
+    Args:
+        company_id (str): The ID of the company
+        pending_items (dict): Dictionary of item IDs to item data
 
-def save_multiple_items_to_database(company_id: str, items_data: dict) -> dict:
+    Returns:
+        list: IDs of the saved items
+    """
+    client = get_redis_client()
+    key = f"company:{company_id}"
+
+    with client.pipeline() as pipe:
+        for _ in range(SAVE_MAX_ATTEMPTS):
+            try:
+                pipe.watch(key)
+                current_items = _load_item_list(pipe, company_id)
+                if current_items is None:
+                    logger.warning("Company %s not found", company_id)
+                    return []
+
+                added_ids = _append_new_items(current_items, pending_items)
+                if added_ids:
+                    pipe.multi()
+                    pipe.hset(key, "item_list", _dumps(current_items))
+                    pipe.execute()
+                    clear_company_cache(company_id)
+                return added_ids
+            except redis.WatchError:
+                continue
+
+    logger.warning("Item list of company %s kept changing, items not saved", company_id)
+    return []
+
+
+def save_multiple_items_to_database(
+    company_id: str, items_data: dict, saved_items: set
+) -> dict:
     """
     Save multiple new items to the company's database in Redis.
 
+    The item list is read and written back once for the whole batch rather than once
+    per item, in a single transaction on the company key (see _save_new_items).
+
     Args:
         company_id (str): The ID of the company
         items_data (dict): Dictionary of item IDs to item data
+        saved_items (set): IDs of the items already saved in the session, updated
+            with the newly saved ones
 
     Returns:
         dict: Results of save operations {item_id: success_status}
     """
+    # Skip if already saved
+    pending_items = {
+        item_id: item_data
+        for item_id, item_data in items_data.items()
+        if item_id not in saved_items
+    }
+
+    if not pending_items:
+        return dict.fromkeys(items_data, "already_saved")
+
+    try:
+        added_ids = _save_new_items(company_id, pending_items)
+    except Exception as e:
+        logger.error("Error saving items to database: %s", e)
+        added_ids = []
+
     results = {}
-    for item_id, item_data in items_data.items():
-        # Skip if already saved
-        if item_id in saved_items_global:
+    for item_id in items_data:
+        if item_id in saved_items:
             results[item_id] = "already_saved"
-            continue
+        else:
+            results[item_id] = "success" if item_id in added_ids else "failed"
+    saved_items.update(added_ids)
 
-        success = save_item_to_database(company_id, item_data)
-        results[item_id] = "success" if success else "failed"
+    return results
 
-        if success:
-            saved_items_global.add(item_id)
 
-    return results
+# Card of a new item in the new items management, filled by create_new_items_interface
+NEW_ITEM_CARD_TEMPLATE = Template("""
+<div style="border: 1px solid #ddd; border-radius: 8px; padding: 15px; margin: 10px 0; background: #f9f9f9;">
+    <div style="display: flex; align-items: center; justify-content: space-between;">
+        <h4 style="margin: 0; color: #333;">Item $index: $title</h4>
+        <div style="display: flex; align-items: center;">
+            <span style="margin-right: 10px; font-weight: bold;">$status_icon $status_text</span>
+        </div>
+    </div>
+    <div style="margin-top: 10px; display: grid; grid-template-columns: 2fr 1fr 1fr; gap: 10px; align-items: center;">
+        <div><strong>Item Name:</strong> $name</div>
+        <div><strong>Unit Price:</strong> €$unit_price</div>
+        <div><strong>Tax Rate:</strong> $tax_rate%</div>
+    </div>
+</div>
+""")
+
+# Status of the new items management while some items are still to be saved
+NEW_ITEMS_MANAGEMENT_TEMPLATE = Template("""
+## 🆕 New Items Management
+
+This invoice contains **$count new items** that need to be added to your company database.
+
+$cards
+
+**💡 Tip:** $tip
+""")
 
 
 def create_new_items_interface(session_state: dict):
@@ -527,29 +900,24 @@ def create_new_items_interface(session_state: dict):
     saved_items = session_state.get("saved_items", set())
 
     # Clear any existing content and create new item cards
-    items_html = ""
-
+    cards = []
     for i, (item_id, item) in enumerate(new_items_dict.items(), 1):
-        status_icon = "🔄" if item_id not in saved_items else "✅"
-        status_text = "Not Saved" if item_id not in saved_items else "Saved"
-
-        items_html += f"""
-<div style="border: 1px solid #ddd; border-radius: 8px; padding: 15px; margin: 10px 0; background: #f9f9f9;">
-    <div style="display: flex; align-items: center; justify-content: space-between;">
-        <h4 style="margin: 0; color: #333;">Item {i}: {item.get("name", "Unnamed Item")}</h4>
-        <div style="display: flex; align-items: center;">
-            <span style="margin-right: 10px; font-weight: bold;">{status_icon} {status_text}</span>
-        </div>
-    </div>
-    <div style="margin-top: 10px; display: grid; grid-template-columns: 2fr 1fr 1fr; gap: 10px; align-items: center;">
-        <div><strong>Item Name:</strong> {item.get("name", "")}</div>
-        <div><strong>Unit Price:</strong> €{item.get("unit_price", 0)}</div>
-        <div><strong>Tax Rate:</strong> {item.get("tax_rate", 0)}%</div>
-    </div>
-</div>
-"""
+        status_icon, status_text = (
+            ("🔄", "Not Saved") if item_id not in saved_items else ("✅", "Saved")
+        )
+        cards.append(
+            NEW_ITEM_CARD_TEMPLATE.substitute(
+                index=i,
+                title=item.get("name", "Unnamed Item"),
+                status_icon=status_icon,
+                status_text=status_text,
+                name=item.get("name", ""),
+                unit_price=item.get("unit_price", 0),
+                tax_rate=item.get("tax_rate", 0),
+            )
+        )
 
-    return items_html
+    return "".join(cards)
 
 
 def schedule_reset_with_status(session_state: dict, status_message: str):
@@ -563,13 +931,26 @@ def schedule_reset_with_status(session_state: dict, status_message: str):
     Returns:
         gr.update: Update for confirmation_status component
     """
-    # Schedule reset
-    session_state["reset_scheduled"] = True
+    # Schedule reset, executed by check_for_reset once the delay has passed
+    session_state["reset_at"] = time.monotonic() + RESET_DELAY
 
     # Return status update
     return gr.update(value=status_message, visible=True)
 
 
+def activate_reset_timer(session_state: dict):
+    """
+    Start the reset timer of the session only once a reset has been scheduled.
+
+    Args:
+        session_state (dict): The current session state
+
+    Returns:
+        gr.Timer: Update activating the timer if a reset is pending
+    """
+    return gr.Timer(active=session_state.get("reset_at") is not None)
+
+
 def handle_invoice_confirmation(session_state: dict):
     """
     Enhanced invoice confirmation that shows individual item cards for easy management.
@@ -640,44 +1021,18 @@ def reset_app_state(session_state: dict):
     Returns:
         tuple: Updates for various UI components
     """
-    global \
-        current_invoice_json, \
-        available_items_global, \
-        new_items_global, \
-        saved_items_global
-
     # Reset the thread to a new thread with the system prompt
-    session_state["thread"] = Thread(
-        sys_prompt=load_system_prompt("src/system_prompt.txt")
-    )
+    session_state["thread"] = Thread(sys_prompt=SYS_PROMPT)
 
     # Reset all state variables completely
     session_state["available_items"] = []
     session_state["new_items_dict"] = {}
-    session_state["current_invoice_json"] = None
+    session_state["current_invoice"] = None
     session_state["saved_items"] = set()
-    session_state["reset_scheduled"] = False
-
-    # Also reset global variables for safety (even though they should not be used)
-    current_invoice_json = None
-    available_items_global = []
-    new_items_global = {}
-    saved_items_global = set()
+    session_state["reset_at"] = None
 
     # Clear any other session state keys that might exist
-    keys_to_remove = []
-    for key in session_state.keys():
-        if key not in [
-            "thread",
-            "available_items",
-            "new_items_dict",
-            "current_invoice_json",
-            "saved_items",
-            "reset_scheduled",
-        ]:
-            keys_to_remove.append(key)
-
-    for key in keys_to_remove:
+    for key in session_state.keys() - SESSION_STATE_KEYS:
         del session_state[key]
 
     # Return updates for UI components
@@ -700,34 +1055,105 @@ def reset_app_state(session_state: dict):
 def check_for_reset(session_state: dict):
     """
     Check if a reset has been scheduled and execute it if needed.
-    This function is called periodically by the interval component to implement the delayed reset.
+    This function is called by the reset timer, which is only active while a reset is pending.
 
     Args:
         session_state (dict): The current session state
 
     Returns:
-        tuple: Updates for various UI components or no-op updates if no reset is scheduled
+        tuple: Updates for various UI components and the reset timer, or no-op updates
+            if no reset is due yet
     """
-    if session_state.get("reset_scheduled", False):
+    reset_at = session_state.get("reset_at")
+    if reset_at is not None and time.monotonic() >= reset_at:
         logger.info("Executing scheduled app reset...")
-        time.sleep(5)  # Wait for 5 seconds before resetting
-        return reset_app_state(session_state)
+        # Fire once, the timer is activated again by the next scheduled reset
+        return (*reset_app_state(session_state), gr.Timer(active=False))
 
     # Return no-op updates for all outputs if no reset is scheduled
     # This prevents the UI from changing when no reset is needed
     return (
-        gr.update(),
-        gr.update(),
-        gr.update(),
-        gr.update(),
-        gr.update(),
-        gr.update(),
-        gr.update(),
-        gr.update(),
-        gr.update(),
-        gr.update(),
-        gr.update(),
-        gr.update(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+        gr.skip(),
+    )
+
+
+# Status shown once all the new items are saved, until the app resets
+ALL_ITEMS_SAVED_MESSAGE = """## ✅ All items saved successfully!
+
+All new items have been added to your company database.
+**Thank you for using the invoice generation system!**
+
+*The form will automatically reset in 5 seconds...*"""
+
+
+def _refresh_after_save(
+    company_id: str,
+    session_state: dict,
+    status_message: str,
+    tip: str,
+    company_changed: bool,
+) -> tuple:
+    """
+    Build the UI updates after saving new items, shared by the individual and the
+    batch save.
+
+    Args:
+        company_id (str): The company ID
+        session_state (dict): The current session state
+        status_message (str): The status shown while some items are still to be saved
+        tip (str): The tip of the new items management status
+        company_changed (bool): Whether items were written, so the company info is
+            refreshed
+
+    Returns:
+        tuple: Status message, company info update, confirmation status update and
+            modal visibility update
+    """
+    new_items_dict = session_state["new_items_dict"]
+
+    # Refresh company info automatically if any items were saved
+    company_info_updated = gr.skip()
+    if company_changed:
+        _clear_session_company_cache(session_state)
+        company_info_updated = gr.update(
+            value=display_company_info(company_id, session_state)
+        )
+
+    # Schedule reset if all items have been saved
+    if new_items_dict.keys() <= session_state["saved_items"]:
+        schedule_reset_with_status(session_state, ALL_ITEMS_SAVED_MESSAGE)
+        return (
+            "✅ All items saved successfully!",
+            company_info_updated,
+            gr.update(
+                value=ALL_ITEMS_SAVED_MESSAGE, visible=True
+            ),  # Show unified status
+            gr.update(visible=False),  # Hide modal
+        )
+
+    # Not all items saved yet, keep modal open and show the current state
+    updated_confirmation_html = NEW_ITEMS_MANAGEMENT_TEMPLATE.substitute(
+        count=len(new_items_dict),
+        cards=create_new_items_interface(session_state),
+        tip=tip,
+    )
+    return (
+        status_message,
+        company_info_updated,
+        gr.update(value=updated_confirmation_html),
+        gr.skip(),  # Keep modal visibility unchanged
     )
 
 
@@ -748,89 +1174,47 @@ def save_item_by_id(company_id: str, item_id: str, session_state: dict):
     try:
         # Check if item_id is provided
         if not item_id:
-            return "❌ Please select an item to save", gr.update(), gr.update()
+            return "❌ Please select an item to save", gr.skip(), gr.skip(), gr.skip()
 
         # Check if already saved
         if item_id in saved_items:
-            return "ℹ️ Item already saved to database", gr.update(), gr.update()
+            return "ℹ️ Item already saved to database", gr.skip(), gr.skip(), gr.skip()
 
-        # Get item data directly from global state
+        # Get item data directly from the session state
         if item_id not in new_items_dict:
-            return "❌ Item not found", gr.update(), gr.update()
+            return "❌ Item not found", gr.skip(), gr.skip(), gr.skip()
 
-        item_data = new_items_dict[item_id].copy()
+        item_data = new_items_dict[item_id]
 
         # Save to database using the actual item data
         success = save_item_to_database(company_id, item_data)
 
-        if success:
-            # Mark as saved
-            saved_items.add(item_id)
-
-            # Check if all items are now saved
-            all_items_saved = len(saved_items) == len(new_items_dict)
-
-            # Schedule reset if all items have been saved
-            if all_items_saved:
-                # Use unified reset approach
-                status_message = """## ✅ All items saved successfully!
-
-All new items have been added to your company database.
-**Thank you for using the invoice generation system!**
-
-*The form will automatically reset in 5 seconds...*"""
-
-                schedule_reset_with_status(session_state, status_message)
-
-                return (
-                    "✅ All items saved successfully!",
-                    gr.update(value=display_company_info(company_id)),
-                    gr.update(
-                        value=status_message, visible=True
-                    ),  # Show unified status
-                    gr.update(visible=False),  # Hide modal
-                )
-            else:
-                # Not all items saved yet, keep modal open
-                # Refresh company info automatically
-                company_info_updated = display_company_info(company_id)
-
-                # Update the confirmation status to show current state
-                updated_confirmation_html = f"""
-## 🆕 New Items Management
-
-This invoice contains **{len(new_items_dict)} new items** that need to be added to your company database.
-
-{create_new_items_interface(session_state)}
-
-**💡 Tip:** Select individual items from the dropdown to save them one by one, or use "Save All Items" to save everything at once.
-"""
-
-                status_message = (
-                    f"✅ Successfully saved '{item_data.get('name')}' to database!"
-                )
-
-                return (
-                    status_message,
-                    gr.update(value=company_info_updated),
-                    gr.update(value=updated_confirmation_html),
-                    gr.update(),  # Keep modal visibility unchanged
-                )
-        else:
+        if not success:
             return (
                 f"❌ Failed to save '{item_data.get('name')}'",
-                gr.update(),
-                gr.update(),
+                gr.skip(),
+                gr.skip(),
+                gr.skip(),
             )
 
+        # Mark as saved
+        saved_items.add(item_id)
+        return _refresh_after_save(
+            company_id,
+            session_state,
+            f"✅ Successfully saved '{item_data.get('name')}' to database!",
+            tip='Select individual items from the dropdown to save them one by one, or use "Save All Items" to save everything at once.',
+            company_changed=True,
+        )
+
     except Exception as e:
-        print(f"Error saving item {item_id}: {e}")
-        return f"❌ Error: {str(e)}", gr.update(), gr.update()
+        logger.error("Error saving item %s: %s", item_id, e)
+        return f"❌ Error: {str(e)}", gr.skip(), gr.skip(), gr.skip()
 
 
 def save_all_items(company_id: str, session_state: dict, new_items_table: list = None):
     """
-    Save all unsaved items directly from new_items_global to the database.
+    Save all unsaved items of the session's new_items_dict to the database.
 
     Args:
         company_id (str): The company ID
@@ -842,29 +1226,20 @@ def save_all_items(company_id: str, session_state: dict, new_items_table: list =
     new_items_dict = session_state["new_items_dict"]
     saved_items = session_state["saved_items"]
 
-    try:
-        print("new_items_dict:", new_items_dict)
-        saved_count = 0
-        failed_count = 0
-        already_saved_count = 0
-
-        # Work directly with new_items_global (source of truth)
-        for item_id, item_data in new_items_dict.items():
-            print("Processing item_id:", item_id, "item_data:", item_data)
-
-            # Skip if already saved
-            if item_id in saved_items:
-                already_saved_count += 1
-                continue
-
-            # Save to database using actual item data
-            success = save_item_to_database(company_id, item_data.copy())
+    # Nothing left to save, leave the interface as it is
+    if not new_items_dict.keys() - saved_items:
+        return "No items to save", gr.skip(), gr.skip(), gr.skip()
 
-            if success:
-                saved_items.add(item_id)
-                saved_count += 1
-            else:
-                failed_count += 1
+    try:
+        # Work directly with new_items_dict (source of truth). All the unsaved items
+        # are saved in one batch, which also marks them in saved_items
+        results = save_multiple_items_to_database(
+            company_id, new_items_dict, saved_items
+        )
+        status_counts = Counter(results.values())
+        saved_count = status_counts["success"]
+        failed_count = status_counts["failed"]
+        already_saved_count = status_counts["already_saved"]
 
         # Create status message
         status_parts = []
@@ -879,64 +1254,22 @@ def save_all_items(company_id: str, session_state: dict, new_items_table: list =
             " | ".join(status_parts) if status_parts else "No items to save"
         )
 
-        # Check if all items are saved
-        all_items_saved = (saved_count + already_saved_count) == len(
-            new_items_dict
-        ) and failed_count == 0
-
-        # Schedule reset if all items were saved successfully
-        if all_items_saved:
-            # Use unified reset approach
-            status_message = """## ✅ All items saved successfully!
-
-All new items have been added to your company database.
-**Thank you for using the invoice generation system!**
-
-*The form will automatically reset in 5 seconds...*"""
-
-            schedule_reset_with_status(session_state, status_message)
-
-            return (
-                "✅ All items saved successfully!",
-                gr.update(value=display_company_info(company_id))
-                if saved_count > 0
-                else gr.update(),
-                gr.update(value=status_message, visible=True),  # Show unified status
-                gr.update(visible=False),  # Hide modal
-            )
-        else:
-            # Not all items saved yet, keep modal open
-            # Refresh company info automatically if any items were saved
-            company_info_updated = gr.update()
-            if saved_count > 0:
-                company_info_updated = gr.update(value=display_company_info(company_id))
-
-            # Update the confirmation status to show current state
-            updated_confirmation_html = f"""
-## 🆕 New Items Management
-
-This invoice contains **{len(new_items_dict)} new items** that need to be added to your company database.
-
-{create_new_items_interface(session_state)}
-
-**💡 Tip:** Items are automatically saved to your company database. Company information will be refreshed automatically after saving.
-"""
-
-            return (
-                status_message,
-                company_info_updated,
-                gr.update(value=updated_confirmation_html),
-                gr.update(),  # Keep modal visibility unchanged
-            )
+        return _refresh_after_save(
+            company_id,
+            session_state,
+            status_message,
+            tip="Items are automatically saved to your company database. Company information will be refreshed automatically after saving.",
+            company_changed=saved_count > 0,
+        )
 
     except Exception as e:
-        print(f"Error saving all items: {e}")
-        return f"❌ Error: {str(e)}", gr.update(), gr.update()
+        logger.error("Error saving all items: %s", e)
+        return f"❌ Error: {str(e)}", gr.skip(), gr.skip(), gr.skip()
 
 
-def send_follow_up_message(  # noqa: C901
+async def send_follow_up_message(  # noqa: C901
     company_id: str, follow_up_message: str, session_state: dict
-) -> tuple[str, str, gr.update, gr.update, gr.update]:
+) -> AsyncIterator[tuple]:
     """Send a follow-up message to the LLM and update reasoning and invoice.
 
     This function now includes the current state of items (both clear and unclear items
@@ -947,30 +1280,49 @@ def send_follow_up_message(  # noqa: C901
         company_id (str): The ID of the company.
         follow_up_message (str): The follow-up message from the user.
 
-    Returns:
-        Tuple[str, str, gr.update, gr.update, bool]: The updated reasoning, generated invoice,
-        update objects for showing results and hiding loading message, and boolean indicating if invoice is valid.
+    Yields:
+        Tuple: The loading state first, then the updated reasoning, generated invoice,
+        update objects for showing results and hiding loading message, showing
+        confirmation and new items groups, and the new items for the DataFrame.
     """
+    # Show the loading message and hide the results and confirmation first, in the
+    # same event as the LLM call rather than in a separate one
+    yield (
+        gr.skip(),
+        gr.skip(),
+        gr.update(visible=False),  # Hide results row
+        gr.update(visible=True),  # Show loading message
+        gr.update(visible=False),  # Hide confirmation group
+        gr.skip(),
+        gr.skip(),
+    )
+
     thread = session_state["thread"]
     if not thread:
-        return (
+        yield (
             "No initial invoice generation found. Please generate an invoice first.",
             "",
             gr.update(visible=False),
             gr.update(visible=False),
             gr.update(visible=False),
+            gr.skip(),
+            gr.skip(),
         )
+        return
 
-    # Get data from Redis
-    company_data = get_data_from_redis(company_id)
+    # Get data from Redis, off the event loop since the client blocks
+    company_data = await asyncio.to_thread(_get_company_data, company_id, session_state)
     if not company_data:
-        return (
+        yield (
             "Company does not exist",
             "",
             gr.update(visible=False),
             gr.update(visible=False),
             gr.update(visible=False),
+            gr.skip(),
+            gr.skip(),
         )
+        return
 
     # ENHANCED FOLLOW-UP CONTEXT:
     # Include current state of items to ensure LLM has up-to-date information
@@ -980,8 +1332,9 @@ def send_follow_up_message(  # noqa: C901
     # Combine the follow-up message with current invoice state
     user_input = f"{follow_up_message}\n{current_items_context}"
 
-    # Call the LLM and get the response
-    response = thread.send_message(
+    # Call the LLM and get the response, awaited on the async client so that the
+    # worker can serve other events in the meantime
+    response = await thread.async_send_message(
         content=user_input,
         save_message=True,
         show_all=False,
@@ -989,16 +1342,29 @@ def send_follow_up_message(  # noqa: C901
         response_format=LLMResponse,
     )
 
+    if response is None:
+        # The request failed, keep the current invoice and let the user retry
+        yield (
+            LLM_ERROR_MESSAGE,
+            gr.skip(),
+            gr.update(visible=True),  # Show results row
+            gr.update(visible=False),  # Hide loading message
+            gr.skip(),
+            gr.skip(),
+            gr.skip(),
+        )
+        return
+
     # Extract reasoning and invoice from the response
-    reasoning, invoice = extract_reasoning_and_invoice(response["content"])
-    reasoning_json = json.loads(reasoning)
+    reasoning_json, invoice = extract_reasoning_and_invoice(
+        response["content"], response.get("parsed")
+    )
     reasoning_markdown = format_reasoning_as_markdown(reasoning_json)
 
-    # Check if the invoice is valid and update global variables
+    # Check if the invoice is valid and update the session state
     is_valid_invoice = reasoning_json.get("is_valid_invoice")
 
-    # PRESERVE USER EDITS: Handle global state updates carefully to maintain user edits
-    # global available_items_global, new_items_global
+    # PRESERVE USER EDITS: Handle session state updates carefully to maintain user edits
 
     # Get new items from LLM response
     refreshed_available_items = reasoning_json.get("Analysis", {}).get(
@@ -1019,34 +1385,35 @@ def send_follow_up_message(  # noqa: C901
         if session_state["new_items_dict"]:
             preserved_items = {}
 
+            # Index the existing edits by their current, possibly edited, name
+            # once, keeping the first item of each name. The IDs are not used for
+            # matching since they are derived from the names generated by the LLM.
+            existing_by_name = {}
+            for existing_item in session_state["new_items_dict"].values():
+                if existing_item.get("name") != "PLACEHOLDER":
+                    existing_by_name.setdefault(
+                        existing_item.get("name", "").lower().strip(), existing_item
+                    )
+
             # For each new item from LLM response
             for new_id, new_item in refreshed_new_items_dict.items():
                 # Check if there's a similar item in existing edits (match by name)
-                matching_existing = None
-                for existing_id, existing_item in session_state[
-                    "new_items_dict"
-                ].items():
-                    if (
-                        existing_item.get("name", "").lower().strip()
-                        == new_item.get("name", "").lower().strip()
-                        and existing_item.get("name") != "PLACEHOLDER"
-                    ):
-                        matching_existing = (existing_id, existing_item)
-                        break
-
-                if matching_existing:
+                existing_item = existing_by_name.get(
+                    new_item.get("name", "").lower().strip()
+                )
+
+                if existing_item:
                     # Preserve user edits, only update if field was PLACEHOLDER
-                    existing_id, existing_item = matching_existing
-                    merged_item = new_item.copy()
-                    for field in ["name", "quantity", "unit_price", "tax_rate"]:
-                        if existing_item.get(field) not in [
-                            "PLACEHOLDER",
-                            "",
-                            None,
-                        ] and existing_item.get(field) != new_item.get(field):
-                            # User has edited this field, preserve their edit
-                            merged_item[field] = existing_item[field]
-                    preserved_items[new_id] = merged_item
+                    # Fields the user has edited, the item is only copied if any
+                    overrides = {
+                        field: value
+                        for field in ITEM_FIELDS
+                        if (value := existing_item.get(field)) not in MISSING_VALUES
+                        and value != new_item.get(field)
+                    }
+                    preserved_items[new_id] = (
+                        {**new_item, **overrides} if overrides else new_item
+                    )
                 else:
                     # New item not found in existing edits, use as-is
                     preserved_items[new_id] = new_item
@@ -1060,18 +1427,18 @@ def send_follow_up_message(  # noqa: C901
         pass
 
     # Generate updated invoice HTML with preserved user edits and recalculated totals
-    # We need to regenerate with current global state (including preserved edits)
+    # We need to regenerate with current session state (including preserved edits)
     invoice_data, invoice_html = get_invoice_html(
         invoice, session_state["available_items"], session_state["new_items_dict"]
     )
 
-    # Update the current invoice JSON with recalculated values
-    session_state["current_invoice_json"] = json.dumps(invoice_data)
+    # Update the current invoice with recalculated values
+    session_state["current_invoice"] = invoice_data
 
     has_new_items = reasoning_json.get("has_new_items", False)
 
     # Determine if invoice is completed (no new items or all new items filled)
-    # Use the current global new items state (which includes any user edits)
+    # Use the current session new items state (which includes any user edits)
     invoice_completed = is_invoice_completed(session_state["new_items_dict"])
 
     # Show confirm button only if invoice is valid AND completed
@@ -1080,11 +1447,11 @@ def send_follow_up_message(  # noqa: C901
     new_items_df = None
     if has_new_items:
         # Extract new items for the DataFrame
-        new_items_df = extract_new_items_for_df(reasoning_json)
+        new_items_df = extract_new_items_for_df(refreshed_new_items)
 
-    # Return updates to show results and hide loading
-    # The function now maintains global state consistency and includes user edits from DataFrame
-    return (
+    # Show results and hide loading
+    # The function now maintains session state consistency and includes user edits from DataFrame
+    yield (
         reasoning_markdown,  # Updated reasoning output
         invoice_html,  # Updated invoice HTML with current state
         gr.update(visible=True),  # Show results row
@@ -1111,61 +1478,97 @@ def format_current_items_for_followup(session_state: dict) -> str:
     available_items = session_state["available_items"]
     new_items_dict = session_state["new_items_dict"]
 
-    context = "\n=== CURRENT INVOICE STATE ===\n"
+    parts = ["\n=== CURRENT INVOICE STATE ===\n"]
 
     # Add available items that exist in company database
     if available_items:
-        context += "\nAVAILABLE ITEMS (From company database):\n"
+        parts.append("\nAVAILABLE ITEMS (From company database):\n")
         for idx, item in enumerate(available_items, 1):
-            context += f"{idx}. {item.get('name', 'N/A')} - Qty: {item.get('quantity', 'N/A')}, "
-            context += f"Unit Price: €{item.get('unit_price', 0):.2f}, "
-            context += f"Tax Rate: {item.get('tax_rate', 0)}%, "
-            context += f"Total: €{item.get('total_price', 0):.2f}\n"
+            parts.append(
+                f"{idx}. {item.get('name', 'N/A')} - Qty: {item.get('quantity', 'N/A')}, "
+                f"Unit Price: €{item.get('unit_price', 0):.2f}, "
+                f"Tax Rate: {item.get('tax_rate', 0)}%, "
+                f"Total: €{item.get('total_price', 0):.2f}\n"
+            )
 
     # Add new items with their current state (including user edits)
     if new_items_dict:
-        context += (
+        parts.append(
             "\nNEW ITEMS TO BE ADDED TO DATABASE (Current state after user edits):\n"
         )
-        for idx, (item_id, item) in enumerate(new_items_dict.items(), 1):
-            context += f"{idx}. {item.get('name', 'PLACEHOLDER')} - "
-            context += f"Qty: {item.get('quantity', 'PLACEHOLDER')}, "
-            context += f"Unit Price: {item.get('unit_price', 'PLACEHOLDER')}, "
-            context += f"Tax Rate: {item.get('tax_rate', 'PLACEHOLDER')}\n"
+        for idx, item in enumerate(new_items_dict.values(), 1):
+            # Fetch the fields once, for both the line and the missing fields
+            values = [item.get(field, "PLACEHOLDER") for field in ITEM_FIELDS]
+            name, quantity, unit_price, tax_rate = values
+            parts.append(
+                f"{idx}. {name} - Qty: {quantity}, "
+                f"Unit Price: {unit_price}, Tax Rate: {tax_rate}\n"
+            )
 
             # Indicate which fields still need user input
-            placeholder_fields = []
-            for field in ["name", "quantity", "unit_price", "tax_rate"]:
-                if item.get(field) in ["PLACEHOLDER", "", None]:
-                    placeholder_fields.append(field)
+            placeholder_fields = [
+                field
+                for field, value in zip(ITEM_FIELDS, values, strict=True)
+                if value in MISSING_VALUES
+            ]
 
             if placeholder_fields:
-                context += f"   → Still needs: {', '.join(placeholder_fields)}\n"
+                parts.append(f"   → Still needs: {', '.join(placeholder_fields)}\n")
             else:
-                context += (
+                parts.append(
                     "   → All fields completed by user (ready to add to database)\n"
                 )
 
     if not available_items and not new_items_dict:
-        context += "\nNo items currently in the invoice.\n"
+        parts.append("\nNo items currently in the invoice.\n")
+
+    parts.append("\n=== END CURRENT STATE ===\n")
+
+    return "".join(parts)
+
+
+# Rows of the invoice items and totals tables, filled by format_invoice_as_html
+INVOICE_ITEM_ROW_TEMPLATE = (
+    "<tr><td>{name}</td><td>{quantity}</td><td>{unit_price}</td>"
+    "<td>{tax_rate}</td><td>{total_price}</td></tr>"
+)
+INVOICE_TOTALS_TEMPLATE = (
+    '<table class="invoice-total">'
+    "<tr><td>Subtotal:</td><td>{subtotal}</td></tr>"
+    "<tr><td>Tax:</td><td>{tax}</td></tr>"
+    '<tr class="total-row"><td>Total:</td><td>{total_due}</td></tr>'
+    "</table>"
+)
+
+
+def _format_amount(value, currency: str = "€"):
+    """Format float values as an amount, leave anything else (e.g. PLACEHOLDER) as is."""
+    return f"{currency}{value:.2f}" if isinstance(value, float) else value
 
-    context += "\n=== END CURRENT STATE ===\n"
 
-    return context
+def _format_invoice_item(item: dict) -> dict:
+    """Format the values of an invoice item for INVOICE_ITEM_ROW_TEMPLATE."""
+    return {
+        "name": item.get("name", ""),
+        "quantity": item.get("quantity", ""),
+        "unit_price": _format_amount(item.get("unit_price")),
+        "tax_rate": _format_amount(item.get("tax_rate"), currency=""),
+        "total_price": _format_amount(item.get("total_price")),
+    }
 
 
-def format_invoice_as_html(invoice_json: str) -> str:
-    """Format the invoice JSON as HTML for better visualization.
+def format_invoice_as_html(invoice: dict | str) -> str:
+    """Format the invoice as HTML for better visualization.
 
     Args:
-        invoice_json (str): The invoice JSON string.
+        invoice (dict | str): The invoice dictionary or JSON string.
 
     Returns:
         str: The formatted invoice as HTML.
     """
     try:
-        # Parse the invoice JSON
-        invoice_data = json.loads(invoice_json)
+        # Parse the invoice JSON, if not given as a dictionary already
+        invoice_data = invoice if isinstance(invoice, dict) else orjson.loads(invoice)
 
         # Check if it's a not-invoice response
         if (
@@ -1174,112 +1577,94 @@ def format_invoice_as_html(invoice_json: str) -> str:
         ):
             return "<p>The input does not appear to be for an invoice generation request.</p>"
 
-        # Start building HTML with styles
-        html = INVOICE_STYLES
-        html += '<div class="invoice-container">'
+        # Start building HTML, the styles are part of the page (see INVOICE_CSS)
+        parts = ['<div class="invoice-container">']
 
         # Header section
-        html += '<div class="invoice-header">'
-        html += f'<div><h1 class="invoice-title">{invoice_data.get("business_name", "")}</h1>'
-        html += f"<p>{invoice_data.get('business_address', '')}</p>"
-        html += f'<p class="contact-info">{invoice_data.get("business_contact", "")}</p></div>'
-        html += f'<div><h2>INVOICE</h2><p class="invoice-id">#{invoice_data.get("invoice_number", "")}</p>'
-        html += f"<p>Date: {invoice_data.get('invoice_date', '')}</p>"
-        html += f"<p>Due: {invoice_data.get('due_date', '')}</p></div>"
-        html += "</div>"
+        parts.append(
+            '<div class="invoice-header">'
+            f'<div><h1 class="invoice-title">{invoice_data.get("business_name", "")}</h1>'
+            f"<p>{invoice_data.get('business_address', '')}</p>"
+            f'<p class="contact-info">{invoice_data.get("business_contact", "")}</p></div>'
+            f'<div><h2>INVOICE</h2><p class="invoice-id">#{invoice_data.get("invoice_number", "")}</p>'
+            f"<p>Date: {invoice_data.get('invoice_date', '')}</p>"
+            f"<p>Due: {invoice_data.get('due_date', '')}</p></div>"
+            "</div>"
+        )
 
         # Customer and invoice details
-        html += '<div class="invoice-details">'
-        html += '<div class="invoice-details-left">'
-        html += '<h3 class="section-title">Bill To:</h3>'
-        html += f"<p><strong>{invoice_data.get('customer_name', '')}</strong></p>"
-        html += f"<p>{invoice_data.get('customer_address', '')}</p>"
-        html += f"<p>{invoice_data.get('customer_contact', '')}</p>"
-        html += "</div>"
-        html += "</div>"
+        parts.append(
+            '<div class="invoice-details">'
+            '<div class="invoice-details-left">'
+            '<h3 class="section-title">Bill To:</h3>'
+            f"<p><strong>{invoice_data.get('customer_name', '')}</strong></p>"
+            f"<p>{invoice_data.get('customer_address', '')}</p>"
+            f"<p>{invoice_data.get('customer_contact', '')}</p>"
+            "</div>"
+            "</div>"
+        )
 
         # Items table
-        html += '<h3 class="section-title">Items</h3>'
-        html += '<table class="invoice-items">'
-        html += "<thead><tr><th>Item Name</th><th>Quantity</th><th>Unit Price</th><th>Tax Rate</th><th>Total</th></tr></thead>"
-        html += "<tbody>"
+        parts.append(
+            '<h3 class="section-title">Items</h3>'
+            '<table class="invoice-items">'
+            "<thead><tr><th>Item Name</th><th>Quantity</th><th>Unit Price</th><th>Tax Rate</th><th>Total</th></tr></thead>"
+            "<tbody>"
+        )
 
         # Add each item
-        for item in invoice_data.get("items", []):
-            # print("item:", item)
-            html += "<tr>"
-            html += f"<td>{item.get('name', '')}</td>"
-            html += f"<td>{item.get('quantity', '')}</td>"
-            unit_price = (
-                f"€{item.get('unit_price', 0):.2f}"
-                if isinstance(item.get("unit_price"), float)
-                else item.get("unit_price")
-            )
-            html += f"<td>{unit_price}</td>"
-            tax_rate = (
-                f"{item.get('tax_rate', 0):.2f}"
-                if isinstance(item.get("tax_rate"), float)
-                else item.get("tax_rate")
-            )
-            total = (
-                f"€{item.get('total_price', 0):.2f}"
-                if isinstance(item.get("total_price"), float)
-                else item.get("total_price")
-            )
-            html += f"<td>{tax_rate}</td>"
-            html += f"<td>{total}</td>"
-            html += "</tr>"
-        html += "</tbody></table>"
+        parts.extend(
+            INVOICE_ITEM_ROW_TEMPLATE.format_map(_format_invoice_item(item))
+            for item in invoice_data.get("items", [])
+        )
+        parts.append("</tbody></table>")
 
         # Totals
-        html += '<table class="invoice-total">'
-        subtotal = (
-            f"€{invoice_data.get('subtotal', 0):.2f}"
-            if isinstance(invoice_data.get("subtotal"), float)
-            else invoice_data.get("subtotal")
-        )
-        tax = (
-            f"€{invoice_data.get('tax', 0):.2f}"
-            if isinstance(invoice_data.get("tax"), float)
-            else invoice_data.get("tax")
-        )
-        total_due = (
-            f"€{invoice_data.get('total_due', 0):.2f}"
-            if isinstance(invoice_data.get("total_due"), float)
-            else invoice_data.get("total_due")
+        parts.append(
+            INVOICE_TOTALS_TEMPLATE.format_map(
+                {
+                    "subtotal": _format_amount(invoice_data.get("subtotal")),
+                    "tax": _format_amount(invoice_data.get("tax")),
+                    "total_due": _format_amount(invoice_data.get("total_due")),
+                }
+            )
         )
-        html += f"<tr><td>Subtotal:</td><td>{subtotal}</td></tr>"
-        html += f"<tr><td>Tax:</td><td>{tax}</td></tr>"
-        html += f'<tr class="total-row"><td>Total:</td><td>{total_due}</td></tr>'
-        html += "</table>"
 
         # Payment terms and notes
-        html += f'<div class="payment-terms"><strong>Payment Terms:</strong> {invoice_data.get("payment_terms", "")}</div>'
+        parts.append(
+            f'<div class="payment-terms"><strong>Payment Terms:</strong> {invoice_data.get("payment_terms", "")}</div>'
+        )
 
         if invoice_data.get("notes"):
-            html += f'<div class="invoice-notes">{invoice_data.get("notes", "")}</div>'
+            parts.append(
+                f'<div class="invoice-notes">{invoice_data.get("notes", "")}</div>'
+            )
 
         # Close the container
-        html += "</div>"
+        parts.append("</div>")
 
-        return html
+        return "".join(parts)
     except Exception as e:
-        print(f"Error formatting invoice: {e}")
+        logger.error("Error formatting invoice: %s", e)
         # If there's an error, return the raw JSON with line breaks for readability
-        return f"<pre>{invoice_json}</pre>"
+        try:
+            raw_invoice = (
+                invoice if isinstance(invoice, str) else _dumps_pretty(invoice)
+            )
+        except orjson.JSONEncodeError:
+            raw_invoice = str(invoice)
+        return f"<pre>{html.escape(raw_invoice)}</pre>"
 
 
-def extract_new_items_for_df(reasoning_json: dict) -> list:
-    """Extract new items from the reasoning JSON and format them for the DataFrame.
+def extract_new_items_for_df(new_items: Iterable[dict]) -> list:
+    """Format the new items of the reasoning for the DataFrame.
 
     Args:
-        reasoning_json (dict): The parsed reasoning JSON.
+        new_items (Iterable[dict]): The new items, as already extracted from the reasoning.
 
     Returns:
         list: List of new items formatted for the DataFrame for user editing.
     """
-
-    new_items = reasoning_json.get("Analysis").get("new_items", [])
     new_items = [
         [
             item.get("name", ""),
@@ -1289,7 +1674,6 @@ def extract_new_items_for_df(reasoning_json: dict) -> list:
         ]
         for item in new_items
     ]
-    # print("new_items:", new_items)
     return new_items
 
 
@@ -1300,24 +1684,21 @@ def update_invoice_with_edited_items(
 
     Args:
         new_items_df (list): The edited new items from the DataFrame.
-        invoice_json_str (str): The current invoice JSON string.
+        session_state (dict): The session state holding the current invoice.
 
     Returns:
         tuple[str, gr.update]: The updated invoice HTML and confirmation group visibility update.
     """
     try:
-        # global current_invoice_json, available_items_global, new_items_global
-        invoice_json_str = session_state["current_invoice_json"]
+        current_invoice = session_state["current_invoice"]
         available_items = session_state["available_items"]
         new_items_dict = session_state["new_items_dict"]
 
-        # Map DataFrame rows back to IDs using the order of new_items_global keys
-        keys = list(new_items_dict.keys())
-        for idx, row in new_items_df.iterrows():
-            # print(row)
-            id = keys[idx]
-            name, quantity, unit_price, tax_rate = row
-            new_items_dict[id].update(
+        # Map DataFrame rows back to IDs using the order of new_items_dict keys
+        for item, (name, quantity, unit_price, tax_rate) in zip(
+            new_items_dict.values(), new_items_df.itertuples(index=False, name=None)
+        ):
+            item.update(
                 {
                     "name": name,
                     "quantity": quantity,
@@ -1325,11 +1706,10 @@ def update_invoice_with_edited_items(
                     "tax_rate": tax_rate,
                 }
             )
-        print("new_items_dict:", new_items_dict)
         invoice_data, invoice_html = get_invoice_html(
-            invoice_json_str, available_items, new_items_dict
+            current_invoice, available_items, new_items_dict
         )
-        session_state["current_invoice_json"] = json.dumps(invoice_data)
+        session_state["current_invoice"] = invoice_data
 
         # Check if invoice is now completed and should show confirm button
         invoice_completed = is_invoice_completed(new_items_dict)
@@ -1338,7 +1718,7 @@ def update_invoice_with_edited_items(
 
         return invoice_html, gr.update(visible=show_confirm_button)
     except Exception as e:
-        print(f"Error updating invoice: {e}")
+        logger.error("Error updating invoice: %s", e)
         return f"<p>Error updating invoice: {str(e)}</p>", gr.update(visible=False)
 
 
@@ -1363,15 +1743,15 @@ def is_invoice_completed(new_items_dict: dict) -> bool:
     # Check if all new items have valid values (no PLACEHOLDER)
     for item in new_items_dict.values():
         # Check if any required field contains PLACEHOLDER or is empty
-        required_fields = ["name", "quantity", "unit_price", "tax_rate"]
-        for field in required_fields:
+        for field in ITEM_FIELDS:
             value = item.get(field, "")
-            if value == "PLACEHOLDER" or value == "" or value is None:
+            if value in MISSING_VALUES:
                 return False
-            # Additional validation for numeric fields
-            if field in ["quantity", "unit_price", "tax_rate"]:
+            # Additional validation for numeric fields, skipped if already a number
+            number_type = NUMERIC_ITEM_FIELDS.get(field)
+            if number_type is not None and not isinstance(value, number_type):
                 try:
-                    float(value) if field != "quantity" else int(value)
+                    number_type(value)
                 except (ValueError, TypeError):
                     return False
 
@@ -1407,17 +1787,15 @@ New items management closed. The invoice has been processed.
     ]
 
 
-with gr.Blocks(theme=gr.themes.Default(primary_hue="blue")) as demo:
+with gr.Blocks(theme=gr.themes.Default(primary_hue="blue"), css=INVOICE_CSS) as demo:
     # Initialize session state
-    session_state = gr.State(
-        {"thread": Thread(sys_prompt=load_system_prompt("src/system_prompt.txt"))}
-    )
-    logger.info(f"Session state: {session_state}")
+    session_state = gr.State({"thread": Thread(sys_prompt=SYS_PROMPT)})
+    logger.info("Session state: %s", session_state)
 
     gr.Markdown(f"# Invoice Generation App - v {get_project_version()}")
 
-    # Create a timer for periodic reset checking (every 5 seconds)
-    reset_timer = gr.Timer(5)
+    # Timer executing the scheduled reset, inactive until a reset is scheduled
+    reset_timer = gr.Timer(RESET_DELAY, active=False)
 
     # First row: Input data and company information
     with gr.Row():
@@ -1544,7 +1922,7 @@ with gr.Blocks(theme=gr.themes.Default(primary_hue="blue")) as demo:
             gr.Markdown("### Reasoning")
             reasoning_output = gr.Markdown(label="")
 
-    # Connect the timer to check for scheduled resets every 5 seconds
+    # Connect the timer to execute the scheduled reset once it is due
     reset_timer.tick(
         fn=check_for_reset,
         inputs=[session_state],
@@ -1561,28 +1939,20 @@ with gr.Blocks(theme=gr.themes.Default(primary_hue="blue")) as demo:
             confirmation_status,  # Hide confirmation status
             confirm_button,  # Hide confirm button
             new_items_modal,  # Hide new items modal
+            reset_timer,  # Stop the timer after the reset
         ],
         show_progress=False,
     )
 
-    company_id.change(fn=display_company_info, inputs=company_id, outputs=company_info)
-
-    # First click handler - show loading message, hide results
-    generate_button.click(
-        fn=lambda: (
-            gr.update(visible=True),
-            gr.update(visible=False),
-            gr.update(visible=False),
-        ),
-        inputs=[],
-        outputs=[loading_message, results_row, follow_up_group],
+    company_id.change(
+        fn=display_company_info,
+        inputs=[company_id, session_state],
+        outputs=company_info,
     )
 
-    # Second click handler - process invoice and update UI
+    # Generate button - show loading message, then stream the invoice and update UI
     generate_button.click(
-        fn=lambda company_id, input_message, session_state: get_reasoning_and_invoice(
-            company_id, input_message, session_state
-        ),
+        fn=get_reasoning_and_invoice,
         inputs=[company_id, input_message, session_state],
         outputs=[
             reasoning_output,
@@ -1596,18 +1966,7 @@ with gr.Blocks(theme=gr.themes.Default(primary_hue="blue")) as demo:
         ],
     )
 
-    # Follow-up button - first show loading message, hide results and confirmation
-    follow_up_button.click(
-        fn=lambda: (
-            gr.update(visible=True),
-            gr.update(visible=False),
-            gr.update(visible=False),
-        ),
-        inputs=[],
-        outputs=[loading_message, results_row, confirmation_group],
-    )
-
-    # Follow-up button - process update and show results
+    # Follow-up button - show loading message, then process update and show results
     follow_up_button.click(
         fn=send_follow_up_message,
         inputs=[company_id, follow_up_message, session_state],
@@ -1635,16 +1994,17 @@ with gr.Blocks(theme=gr.themes.Default(primary_hue="blue")) as demo:
     )
 
     # Real-time update: whenever the DataFrame changes, update the invoice preview and confirm button visibility
+    # Edits made while a render is running are coalesced into one render of the last
+    # state of the table, without flashing the progress overlay on every edit
     new_items_df.change(
-        fn=lambda df, session_state: update_invoice_with_edited_items(
-            df, session_state
-        ),
+        fn=update_invoice_with_edited_items,
         inputs=[new_items_df, session_state],
         outputs=[
             invoice_output,
             confirmation_group,
         ],  # Now returns both invoice HTML and confirmation visibility
-        show_progress=True,
+        show_progress="hidden",
+        trigger_mode="always_last",
     )
 
     # Enhanced confirmation button handler with modal support
@@ -1657,7 +2017,7 @@ with gr.Blocks(theme=gr.themes.Default(primary_hue="blue")) as demo:
             new_items_management_table,
             item_selector,
         ],
-    )
+    ).then(fn=activate_reset_timer, inputs=[session_state], outputs=reset_timer)
 
     # New items management event handlers
 
@@ -1666,14 +2026,14 @@ with gr.Blocks(theme=gr.themes.Default(primary_hue="blue")) as demo:
         fn=save_item_by_id,
         inputs=[company_id, item_selector, session_state],
         outputs=[save_status, company_info, confirmation_status, new_items_modal],
-    )
+    ).then(fn=activate_reset_timer, inputs=[session_state], outputs=reset_timer)
 
     # Save all items handler (with automatic company info refresh and status update)
     save_all_button.click(
         fn=save_all_items,
         inputs=[company_id, session_state],
         outputs=[save_status, company_info, confirmation_status, new_items_modal],
-    )
+    ).then(fn=activate_reset_timer, inputs=[session_state], outputs=reset_timer)
 
     # Close new items management section handler
     close_modal_button.click(
@@ -1685,7 +2045,27 @@ with gr.Blocks(theme=gr.themes.Default(primary_hue="blue")) as demo:
             item_selector,
             confirmation_status,
         ],
-    )
+    ).then(fn=activate_reset_timer, inputs=[session_state], outputs=reset_timer)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Release the async LLM client of the server loop when the server stops."""
+    yield
+    await aclose_http_clients()
+
 
 if __name__ == "__main__":
-    demo.launch(share=False, debug=True, server_port=8002, server_name="0.0.0.0")
+    try:
+        demo.queue(
+            default_concurrency_limit=QUEUE_CONCURRENCY_LIMIT, max_size=QUEUE_MAX_SIZE
+        ).launch(
+            share=False,
+            debug=True,
+            server_port=8002,
+            server_name="0.0.0.0",
+            app_kwargs={"lifespan": lifespan},
+        )
+    finally:
+        # The server has stopped, release the connection pool of the sync LLM client
+        close_http_clients()
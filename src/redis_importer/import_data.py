@@ -1,9 +1,12 @@
-import json
 import os
 from typing import Any
 
+import orjson
 import redis
 
+# Number of companies queued in the pipeline before it is flushed to Redis
+BATCH_SIZE = 1000
+
 
 def load_data(file_path: str) -> dict[str, Any]:
     """Load data from a JSON file.
@@ -14,8 +17,8 @@ def load_data(file_path: str) -> dict[str, Any]:
     Returns:
         dict: Data loaded from the JSON file.
     """
-    with open(file_path) as file:
-        return json.load(file)
+    with open(file_path, "rb") as file:
+        return orjson.loads(file.read())
 
 
 def main():
@@ -30,7 +33,6 @@ def main():
             host=redis_host,
             port=redis_port,
             password=redis_password,
-            decode_responses=True,
         )
         client.ping()
         print("Connected to Redis")
@@ -38,18 +40,23 @@ def main():
         # Load data from JSON file
         data = load_data(data_file_path)
 
-        # Use pipeline to import data into Redis
+        # Use pipeline to import data into Redis, with one HSET of all the fields per
+        # company, flushed every BATCH_SIZE companies to bound the queued commands
         pipeline = client.pipeline()
-        for company_id, company_data in data.items():
-            for key, value in company_data.items():
-                if isinstance(value, list):
-                    value = json.dumps(value)  # Convert lists to JSON strings
-                pipeline.hset(f"company:{company_id}", key, value)
-            print(f"Prepared import for company {company_id}: {company_data}")
-
-        # Execute pipeline
+        for count, (company_id, company_data) in enumerate(data.items(), 1):
+            mapping = {
+                # Convert lists to JSON, sent as the bytes orjson produces since the
+                # importer only writes and needs no decoded replies
+                key: orjson.dumps(value) if isinstance(value, list) else value
+                for key, value in company_data.items()
+            }
+            pipeline.hset(f"company:{company_id}", mapping=mapping)
+            if count % BATCH_SIZE == 0:
+                pipeline.execute()
+
+        # Execute the rest of the pipeline
         pipeline.execute()
-        print("Data import completed.")
+        print(f"Data import completed for {len(data)} companies.")
 
     except redis.ConnectionError as e:
         print(f"Failed to connect to Redis: {e}")
@@ -15,12 +15,22 @@ class InvoiceItem(BaseModel):
         total_price (float): Total price for the item.
     """
 
-    name: str = Field(..., title="Description of the item", example="Web Development")
-    quantity: int = Field(..., title="Quantity of the item", example=50)
-    unit_price: float | str = Field(..., title="Unit price of the item", example=50.0)
-    tax_rate: float | str = Field(..., title="Tax rate for the item", example=18)
+    name: str = Field(
+        ...,
+        title="Description of the item",
+        json_schema_extra={"example": "Web Development"},
+    )
+    quantity: int = Field(
+        ..., title="Quantity of the item", json_schema_extra={"example": 50}
+    )
+    unit_price: float | str = Field(
+        ..., title="Unit price of the item", json_schema_extra={"example": 50.0}
+    )
+    tax_rate: float | str = Field(
+        ..., title="Tax rate for the item", json_schema_extra={"example": 18}
+    )
     total_price: float | str = Field(
-        ..., title="Total price for the item", example=2500.0
+        ..., title="Total price for the item", json_schema_extra={"example": 2500.0}
     )
 
     model_config = ConfigDict(extra="ignore")
@@ -47,19 +57,27 @@ class NewInvoiceItem(InvoiceItem):
     name: str | PLACEHOLDER = Field(
         default="PLACEHOLDER",
         title="Description of the item",
-        example="Custom Software Development",
+        json_schema_extra={"example": "Custom Software Development"},
     )
     quantity: int | PLACEHOLDER = Field(
-        default="PLACEHOLDER", title="Quantity of the item", example=50
+        default="PLACEHOLDER",
+        title="Quantity of the item",
+        json_schema_extra={"example": 50},
     )
     unit_price: float | PLACEHOLDER = Field(
-        default="PLACEHOLDER", title="Unit price of the item", example=50.0
+        default="PLACEHOLDER",
+        title="Unit price of the item",
+        json_schema_extra={"example": 50.0},
     )
     tax_rate: float | PLACEHOLDER = Field(
-        default="PLACEHOLDER", title="Tax rate for the item", example=18
+        default="PLACEHOLDER",
+        title="Tax rate for the item",
+        json_schema_extra={"example": 18},
     )
     total_price: float | PLACEHOLDER = Field(
-        default="PLACEHOLDER", title="Total price for the item", example=2500.0
+        default="PLACEHOLDER",
+        title="Total price for the item",
+        json_schema_extra={"example": 2500.0},
     )
     is_new_item: bool = Field(
         default=True,
@@ -91,47 +109,71 @@ class Invoice(BaseModel):
     """
 
     business_name: str = Field(
-        ..., title="Name of the business", example="ABC Solutions"
+        ...,
+        title="Name of the business",
+        json_schema_extra={"example": "ABC Solutions"},
     )
     business_address: str = Field(
-        ..., title="Address of the business", example="123 Business Street, Cityville"
+        ...,
+        title="Address of the business",
+        json_schema_extra={"example": "123 Business Street, Cityville"},
     )
     business_contact: str = Field(
         ...,
         title="Contact information of the business",
-        example="Phone: +1-234-567-890 | Email: contact@abcsolutions.com",
+        json_schema_extra={
+            "example": "Phone: +1-234-567-890 | Email: contact@abcsolutions.com"
+        },
     )
     invoice_number: str = Field(
-        ..., title="Unique invoice identifier", example="INV-2025001"
+        ...,
+        title="Unique invoice identifier",
+        json_schema_extra={"example": "INV-2025001"},
     )
     invoice_date: str = Field(
-        ..., title="Date when the invoice is issued", example="2025-02-14"
+        ...,
+        title="Date when the invoice is issued",
+        json_schema_extra={"example": "2025-02-14"},
+    )
+    due_date: str = Field(
+        ..., title="Payment deadline", json_schema_extra={"example": "2025-02-28"}
     )
-    due_date: str = Field(..., title="Payment deadline", example="2025-02-28")
     customer_name: str = Field(
-        ..., title="Name of the customer", example="XYZ Enterprises"
+        ...,
+        title="Name of the customer",
+        json_schema_extra={"example": "XYZ Enterprises"},
     )
     customer_address: str = Field(
-        ..., title="Address of the customer", example="456 Client Avenue, Townsville"
+        ...,
+        title="Address of the customer",
+        json_schema_extra={"example": "456 Client Avenue, Townsville"},
     )
     customer_contact: str = Field(
         ...,
         title="Contact information of the customer",
-        example="Email: billing@xyzenterprises.com",
+        json_schema_extra={"example": "Email: billing@xyzenterprises.com"},
     )
     items: list[InvoiceItem] = Field(..., title="List of items or services billed")
-    subtotal: float | str = Field(..., title="Subtotal amount", example=2740.0)
-    tax: float | str = Field(..., title="Tax amount", example=274.0)
-    total_due: float | str = Field(..., title="Total amount due", example=3014.0)
+    subtotal: float | str = Field(
+        ..., title="Subtotal amount", json_schema_extra={"example": 2740.0}
+    )
+    tax: float | str = Field(
+        ..., title="Tax amount", json_schema_extra={"example": 274.0}
+    )
+    total_due: float | str = Field(
+        ..., title="Total amount due", json_schema_extra={"example": 3014.0}
+    )
     payment_terms: str = Field(
         ...,
         title="Payment terms and methods",
-        example="Net 14 days | Accepted methods: Bank Transfer, PayPal",
+        json_schema_extra={
+            "example": "Net 14 days | Accepted methods: Bank Transfer, PayPal"
+        },
     )
     notes: str | None = Field(
         None,
         title="Additional notes or messages",
-        example="Thank you for your business!",
+        json_schema_extra={"example": "Thank you for your business!"},
     )
 
 
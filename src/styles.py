@@ -1,6 +1,6 @@
-# CSS styles for invoice formatting and custom button styling
-INVOICE_STYLES = """
-<style>
+# CSS styles for invoice formatting and custom button styling, passed once to the
+# Blocks of the app rather than sent along with every rendered invoice
+INVOICE_CSS = """
 /* Simple styling for confirmation button */
 #confirm-invoice-button {
     background-color: #28a745 !important;
@@ -107,5 +107,4 @@ INVOICE_STYLES = """
     color: #666;
     font-size: 0.9em;
 }
-</style>
 """
@@ -0,0 +1,19 @@
+import fakeredis
+import pytest
+
+import gradio_app
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_client(redis_server, monkeypatch):
+    """Redis client of the app, backed by an in-memory fake server."""
+    client = fakeredis.FakeStrictRedis(server=redis_server, decode_responses=True)
+    monkeypatch.setattr(gradio_app, "get_redis_client", lambda: client)
+    gradio_app.clear_company_cache()
+    yield client
+    gradio_app.clear_company_cache()
@@ -0,0 +1,365 @@
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import fakeredis.aioredis
+import orjson
+import pytest
+
+import chat_llm
+from chat_llm import BatchThread, LLMCache, Message, SemanticCache, Thread
+from schema import InvoiceItem, LLMResponse
+
+MESSAGES = [
+    Message(role="system", content="an assistant"),
+    Message(role="user", content="hello"),
+]
+RESPONSE = Message(role="assistant", content="hi")
+
+
+def test_cache_key_is_stable():
+    key = LLMCache.cache_key("gpt-4.1", MESSAGES, 0, 1.0, LLMResponse)
+
+    assert key == LLMCache.cache_key("gpt-4.1", list(MESSAGES), 0, 1.0, LLMResponse)
+    assert key != LLMCache.cache_key("gpt-4.1", MESSAGES, 0, 1.0, InvoiceItem)
+    assert key != LLMCache.cache_key("gpt-4.1", MESSAGES[:1], 0, 1.0, LLMResponse)
+    assert key != LLMCache.cache_key("gpt-4.1", MESSAGES, 0, 0.5, LLMResponse)
+
+
+def test_cache_key_of_sampled_request_is_none():
+    assert LLMCache.cache_key("gpt-4.1", MESSAGES, 0.7, 1.0) is None
+
+
+def test_cache_hit_miss_and_eviction():
+    cache = LLMCache(maxsize=2)
+    cache.set("a", RESPONSE)
+    cache.set("b", RESPONSE)
+
+    assert cache.get("a") == RESPONSE
+    # "b" is now the least recently used entry
+    cache.set("c", RESPONSE)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == RESPONSE
+    assert cache.get("c") == RESPONSE
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_cache_is_shared_through_redis(redis_server):
+    writer = LLMCache(
+        redis_client=fakeredis.FakeStrictRedis(server=redis_server),
+        async_redis_client=fakeredis.aioredis.FakeRedis(server=redis_server),
+    )
+    reader = LLMCache(
+        redis_client=fakeredis.FakeStrictRedis(server=redis_server),
+        async_redis_client=fakeredis.aioredis.FakeRedis(server=redis_server),
+    )
+    writer.set("sync", RESPONSE)
+    asyncio.run(writer.aset("async", RESPONSE))
+
+    assert reader.get("async") == RESPONSE
+    assert asyncio.run(reader.aget("sync")) == RESPONSE
+    assert reader.hits == 2
+
+
+def test_cache_rebuilds_parsed_responses_read_from_redis(redis_server):
+    parsed = InvoiceItem(
+        name="Logo", quantity=2, unit_price=10.0, tax_rate=24.0, total_price=20.0
+    )
+    message = Message(role="assistant", content=parsed.model_dump_json(), parsed=parsed)
+    LLMCache(redis_client=fakeredis.FakeStrictRedis(server=redis_server)).set(
+        "key", message
+    )
+
+    cached = LLMCache(redis_client=fakeredis.FakeStrictRedis(server=redis_server))
+    assert cached.get("key", InvoiceItem)["parsed"] == parsed
+
+
+def test_cache_keys_streamed_responses_apart():
+    key = LLMCache.cache_key("gpt-4.1", MESSAGES, 0, 1.0, LLMResponse)
+
+    assert key != LLMCache.cache_key("gpt-4.1", MESSAGES, 0, 1.0, LLMResponse, True)
+    assert SemanticCache.context_key(MESSAGES) != SemanticCache.context_key(
+        MESSAGES, stream=True
+    )
+
+
+def test_async_cache_only_uses_the_lru_without_async_client(redis_server):
+    client = fakeredis.FakeStrictRedis(server=redis_server)
+    LLMCache(redis_client=client).set("key", RESPONSE)
+
+    # The blocking client is never used from the event loop
+    assert asyncio.run(LLMCache(redis_client=client).aget("key")) is None
+
+
+def test_cache_redis_errors_are_misses():
+    class BrokenRedis:
+        def get(self, key):
+            raise ConnectionError("down")
+
+        def set(self, key, value, ex):
+            raise ConnectionError("down")
+
+    cache = LLMCache(redis_client=BrokenRedis())
+    cache.set("key", RESPONSE)
+
+    assert cache.get("other") is None
+    # The entry is still kept in the LRU
+    assert cache.get("key") == RESPONSE
+
+
+def test_semantic_cache_matches_close_prompts_of_same_context():
+    cache = SemanticCache(threshold=0.9)
+    context_key = cache.context_key(MESSAGES[:1])
+    cache.set(context_key, [1.0, 0.0], RESPONSE)
+
+    assert cache.get(context_key, [0.99, 0.14]) == RESPONSE
+    assert cache.get(context_key, [0.0, 1.0]) is None
+    assert cache.get(cache.context_key(MESSAGES), [1.0, 0.0]) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_semantic_cache_entries_expire(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(chat_llm.time, "monotonic", lambda: now)
+    cache = SemanticCache(ttl=60)
+    cache.set("context", [1.0, 0.0], RESPONSE)
+
+    now += 59
+    assert cache.get("context", [1.0, 0.0]) == RESPONSE
+    now += 2
+    assert cache.get("context", [1.0, 0.0]) is None
+    assert cache._entries == []
+
+
+def _chunk(content: str):
+    delta = SimpleNamespace(content=content)
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeThread(Thread):
+    """Thread on fake clients, streaming one chunk per completion request."""
+
+    def __init__(self):
+        super().__init__()
+        self.temperature = 0
+        self.requests = 0
+
+        async def embed(model, input):
+            return SimpleNamespace(data=[SimpleNamespace(embedding=[3.0, 4.0])])
+
+        async def complete(**kwargs):
+            self.requests += 1
+
+            async def stream():
+                yield _chunk("hi")
+
+            return stream()
+
+        self._aclient = SimpleNamespace(
+            embeddings=SimpleNamespace(create=embed),
+            chat=SimpleNamespace(completions=SimpleNamespace(create=complete)),
+        )
+
+    @property
+    def aclient(self):
+        return self._aclient
+
+
+def test_async_stream_uses_semantic_cache(monkeypatch):
+    monkeypatch.setattr(Thread, "cache", LLMCache())
+    monkeypatch.setattr(Thread, "semantic_cache", SemanticCache())
+    thread = FakeThread()
+
+    async def stream(content):
+        # Bypass the exact cache, so that only the semantic cache can match
+        thread.cache = LLMCache()
+        return [
+            piece async for piece in thread.async_send_message_stream(content, False)
+        ]
+
+    assert asyncio.run(stream("hello")) == ["hi"]
+    assert asyncio.run(stream("hello ")) == ["hi"]
+    assert thread.requests == 1
+    assert thread.semantic_cache.hits == 1
+
+
+def test_thread_cache_is_opt_in():
+    thread = FakeThread()
+
+    async def stream(content):
+        return [
+            piece async for piece in thread.async_send_message_stream(content, False)
+        ]
+
+    asyncio.run(stream("hello"))
+    asyncio.run(stream("hello"))
+    assert thread.requests == 2
+
+
+def _completion(content: str):
+    usage = SimpleNamespace(
+        total_tokens=3,
+        prompt_tokens=2,
+        completion_tokens=1,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+    )
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(usage=usage, choices=[SimpleNamespace(message=message)])
+
+
+def test_send_messages_batch_caps_concurrency_and_keeps_order():
+    in_flight = peak = 0
+
+    async def complete(messages, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        content = messages[-1]["content"]
+        # Later prompts finish first
+        await asyncio.sleep(0.01 / int(content))
+        in_flight -= 1
+        return _completion(f"answer {content}")
+
+    thread = FakeThread()
+    thread.temperature = 1.0
+    thread._aclient.chat.completions.create = complete
+    thread.max_concurrency = 2
+
+    responses = asyncio.run(thread.send_messages_batch(["1", "2", "3", "4", "5"]))
+
+    assert [response["content"] for response in responses] == [
+        f"answer {idx}" for idx in range(1, 6)
+    ]
+    assert peak == 2
+    assert thread.total_tokens == 15
+    # Each prompt is sent on its own, the stack of the thread is untouched
+    assert len(thread.message_stack) == 1
+
+
+def test_response_format_param_matches_sdk():
+    sdk = pytest.importorskip("openai.lib._parsing._completions")
+
+    assert chat_llm._response_format_param(
+        LLMResponse
+    ) == sdk.type_to_response_format_param(LLMResponse)
+
+
+class FakeBatchThread(BatchThread):
+    """Batch thread on a fake client, finishing the batch on its second check."""
+
+    poll_interval = 0
+
+    def __init__(self, status: str, output_lines: list[dict]):
+        super().__init__()
+        self.statuses = ["in_progress", status]
+        output = "\n".join(orjson.dumps(line).decode() for line in output_lines)
+
+        async def create_file(file, purpose):
+            return SimpleNamespace(id="input")
+
+        async def create_batch(**kwargs):
+            return SimpleNamespace(id="batch")
+
+        async def retrieve_batch(batch_id):
+            return SimpleNamespace(status=self.statuses.pop(0), output_file_id="output")
+
+        async def file_content(file_id):
+            return SimpleNamespace(text=output)
+
+        self._aclient = SimpleNamespace(
+            files=SimpleNamespace(create=create_file, content=file_content),
+            batches=SimpleNamespace(create=create_batch, retrieve=retrieve_batch),
+        )
+
+    @property
+    def aclient(self):
+        return self._aclient
+
+
+def _batch_result(custom_id: str, content: str) -> dict:
+    body = {
+        "id": custom_id,
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4.1",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {"total_tokens": 3, "prompt_tokens": 2, "completion_tokens": 1},
+    }
+    return {"custom_id": custom_id, "response": {"status_code": 200, "body": body}}
+
+
+def test_submit_batch_dispatches_results_in_order():
+    thread = FakeBatchThread(
+        "completed",
+        [
+            _batch_result("request-2", "third"),
+            {
+                "custom_id": "request-1",
+                "response": {"status_code": 400},
+                "error": {"message": "bad request"},
+            },
+            _batch_result("request-0", "first"),
+        ],
+    )
+
+    responses = asyncio.run(thread.submit_batch(["a", "b", "c"]))
+
+    assert [response and response["content"] for response in responses] == [
+        "first",
+        None,
+        "third",
+    ]
+    assert thread.total_tokens == 6
+
+
+def test_submit_batch_raises_when_batch_fails():
+    thread = FakeBatchThread("expired", [])
+
+    with pytest.raises(RuntimeError, match="expired"):
+        asyncio.run(thread.submit_batch(["a"]))
+
+
+def test_async_client_is_created_per_event_loop(monkeypatch):
+    monkeypatch.setattr(
+        chat_llm,
+        "_azure_credentials",
+        lambda: {
+            "api_key": "key",
+            "azure_endpoint": "https://example.openai.azure.com",
+            "api_version": "2024-10-21",
+        },
+    )
+
+    async def get_client():
+        client = chat_llm._get_async_client()
+        assert chat_llm._get_async_client() is client
+        await chat_llm.aclose_http_clients()
+        assert client.is_closed()
+        return client
+
+    assert asyncio.run(get_client()) is not asyncio.run(get_client())
+
+
+def test_strict_json_schema_closes_one_of_variants():
+    schema = {
+        "oneOf": [
+            {"type": "object", "properties": {"name": {"type": "string"}}},
+            {"type": "string"},
+        ]
+    }
+
+    strict = chat_llm._strict_json_schema(schema, schema)
+
+    assert strict["oneOf"][0] == {
+        "type": "object",
+        "properties": {"name": {"type": "string"}},
+        "additionalProperties": False,
+        "required": ["name"],
+    }
@@ -0,0 +1,132 @@
+from formats import format_company_info_as_markdown, format_reasoning_as_markdown
+
+# The expected outputs were rendered by the original string-concatenating formatters,
+# which the memoized and templated ones must match exactly
+
+COMPANY = {
+    "company_id": "1",
+    "business_name": "ABC Solutions",
+    "business_address": "123 Business Street, Cityville",
+    "business_contact": "contact@abcsolutions.com",
+    "item_list": [
+        {"item_name": "Web Development", "unit_price": 50.0, "tax_rate": 24},
+        {"item_name": "Hosting", "unit_price": 9.5, "tax_rate": 10},
+    ],
+    "customer_list": [
+        {
+            "customer_name": "XYZ Enterprises",
+            "customer_address": "456 Client Avenue",
+            "customer_contact": "billing@xyz.com",
+        },
+        {"customer_name": "Solo"},
+    ],
+}
+
+REASONING = {
+    "Analysis": {
+        "analysis": "Two items requested.",
+        "available_items": [
+            {
+                "name": "Web Development",
+                "quantity": 10,
+                "unit_price": 50.0,
+                "tax_rate": 24.0,
+                "total_price": 500.0,
+            },
+        ],
+        "new_items": [
+            {
+                "name": "Logo Design",
+                "quantity": 1,
+                "unit_price": "PLACEHOLDER",
+                "tax_rate": 24,
+                "total_price": "PLACEHOLDER",
+                "is_new_item": True,
+            },
+        ],
+    },
+    "is_valid_invoice": True,
+    "has_new_items": True,
+    "decision_analysis": "All details are present.",
+    "Calculations": "10 × 50 = 500",
+}
+
+
+def test_format_company_info():
+    expected = (
+        "#### Business Details\n"
+        "**Name**: ABC Solutions\n\n"
+        "**Address**: 123 Business Street, Cityville\n\n"
+        "**Contact**: contact@abcsolutions.com\n\n"
+        "#### Available Items\n\n"
+        "| Item Name | Unit Price (Tax included)  | Tax Rate |\n"
+        "|----------|------------|----------|\n"
+        "| Web Development | €50.00 | 24% |\n"
+        "| Hosting | €9.50 | 10% |\n\n"
+        "#### Customers\n\n"
+        "**Customer 1**: XYZ Enterprises\n\n"
+        "**Address**: 456 Client Avenue\n\n"
+        "**Contact**: billing@xyz.com\n\n"
+        "**Customer 2**: Solo\n\n"
+        "**Address**: N/A\n\n"
+        "**Contact**: N/A\n\n"
+    )
+
+    assert format_company_info_as_markdown(COMPANY) == expected
+    # Memoized sections are rendered again once the content changes
+    changed = {**COMPANY, "item_list": [COMPANY["item_list"][1]]}
+    assert "Web Development" not in format_company_info_as_markdown(changed)
+    assert format_company_info_as_markdown(COMPANY) == expected
+
+
+def test_format_company_info_without_lists():
+    company = {"business_name": "Bare", "item_list": [], "customer_list": []}
+
+    assert format_company_info_as_markdown(company) == (
+        "#### Business Details\n"
+        "**Name**: Bare\n\n"
+        "**Address**: N/A\n\n"
+        "**Contact**: N/A\n\n"
+    )
+    assert format_company_info_as_markdown({}) == "### Company does not exist"
+
+
+def test_format_reasoning():
+    expected = (
+        "### Invoice\n\n"
+        "#### Analysis\n"
+        "Two items requested.\n\n"
+        "**Available Items (From Company Database):**\n\n"
+        "| Item Name | Quantity | Unit Price | Tax Rate | Total |\n"
+        "|----------|----------|------------|----------|-------|\n"
+        "| Web Development | 10 | €50.00 | €24.00 | €500.00 |\n\n\n"
+        "**New Items (To Be Added to Database):**\n\n"
+        "| Item Name | Quantity | Unit Price | Tax Rate | Total |\n"
+        "|----------|----------|------------|----------|-------|\n"
+        "| Logo Design | 1 | PLACEHOLDER | 24 | PLACEHOLDER |\n\n\n"
+        "#### Invoice Request Status\n✅ Valid\n\n"
+        "#### Item Status\n🆕 Has New Items\n\n"
+        "#### Decision Explanation\nAll details are present.\n\n"
+        "#### Calculations\n10 × 50 = 500\n\n"
+    )
+
+    assert format_reasoning_as_markdown(REASONING, "Invoice") == expected
+
+
+def test_format_reasoning_of_invalid_invoice():
+    reasoning = {
+        **REASONING,
+        "Analysis": "plain",
+        "is_valid_invoice": False,
+        "has_new_items": False,
+        "extra": 1,
+    }
+
+    # The calculations are hidden, any other field gets its own section
+    assert format_reasoning_as_markdown(reasoning) == (
+        "#### Analysis\nplain\n\n"
+        "#### Invoice Request Status\n❌ Invalid\n\n"
+        "#### Item Status\n✅ All Items Available in Database\n\n"
+        "#### Decision Explanation\nAll details are present.\n\n"
+        "#### extra\n1\n\n"
+    )
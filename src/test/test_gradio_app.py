@@ -0,0 +1,318 @@
+import asyncio
+
+import fakeredis
+import orjson
+
+import gradio_app
+from chat_llm import Message, Thread
+from gradio_app import (
+    _save_new_items,
+    activate_reset_timer,
+    assign_ids_to_new_items,
+    check_for_reset,
+    get_invoice_html,
+    save_item_to_database,
+    save_multiple_items_to_database,
+    schedule_reset_with_status,
+    send_follow_up_message,
+)
+
+COMPANY_ID = "1"
+
+
+def _store_company(client, item_list: list):
+    client.hset(
+        f"company:{COMPANY_ID}",
+        mapping={
+            "company_id": COMPANY_ID,
+            "business_name": "ABC Solutions",
+            "item_list": orjson.dumps(item_list),
+            "customer_list": orjson.dumps([]),
+        },
+    )
+
+
+def _stored_item_names(client) -> list:
+    item_list = orjson.loads(client.hget(f"company:{COMPANY_ID}", "item_list"))
+    return [item["item_name"] for item in item_list]
+
+
+def test_redis_client_times_out():
+    client = gradio_app.get_redis_client.__wrapped__("localhost", 6379, "password")
+
+    connection_kwargs = client.connection_pool.connection_kwargs
+    assert connection_kwargs["socket_timeout"] == gradio_app.REDIS_SOCKET_TIMEOUT
+    assert (
+        connection_kwargs["socket_connect_timeout"] == gradio_app.REDIS_SOCKET_TIMEOUT
+    )
+
+
+def test_assign_ids_to_new_items_suffixes_duplicates():
+    items = [{"name": "Logo"}, {"name": " logo "}, {"name": "Banner"}, {"name": "LOGO"}]
+
+    result = assign_ids_to_new_items(items)
+
+    base_id, other_id, banner_id, last_id = result
+    assert (other_id, last_id) == (f"{base_id}-2", f"{base_id}-3")
+    assert list(result.values()) == items
+    # The IDs only depend on the normalized names
+    assert banner_id == next(iter(assign_ids_to_new_items([{"name": "banner"}])))
+
+
+def test_save_new_items(redis_client):
+    _store_company(redis_client, [{"item_name": "Hosting", "unit_price": 9.5}])
+    pending = {
+        "a": {"name": "Logo", "unit_price": 100, "tax_rate": 24},
+        "b": {"name": "hosting", "unit_price": 10, "tax_rate": 24},
+    }
+
+    assert _save_new_items(COMPANY_ID, pending) == ["a"]
+    assert _stored_item_names(redis_client) == ["Hosting", "Logo"]
+    assert _save_new_items("missing", pending) == []
+
+
+def test_save_new_items_retries_on_concurrent_write(
+    redis_client, redis_server, monkeypatch
+):
+    _store_company(redis_client, [])
+    other_client = fakeredis.FakeStrictRedis(server=redis_server)
+    load_item_list = gradio_app._load_item_list
+    loads = []
+
+    def load_then_write_concurrently(client, company_id):
+        item_list = load_item_list(client, company_id)
+        if not loads:
+            # Another session saves an item between the read and the write
+            other_client.hset(
+                f"company:{company_id}",
+                "item_list",
+                orjson.dumps([{"item_name": "Banner", "unit_price": 5.0}]),
+            )
+        loads.append(item_list)
+        return item_list
+
+    monkeypatch.setattr(gradio_app, "_load_item_list", load_then_write_concurrently)
+
+    saved_ids = _save_new_items(COMPANY_ID, {"a": {"name": "Logo", "unit_price": 1}})
+
+    assert saved_ids == ["a"]
+    assert len(loads) == 2
+    # The concurrent write is kept
+    assert _stored_item_names(redis_client) == ["Banner", "Logo"]
+
+
+def test_save_new_items_gives_up_when_list_keeps_changing(
+    redis_client, redis_server, monkeypatch
+):
+    _store_company(redis_client, [])
+    other_client = fakeredis.FakeStrictRedis(server=redis_server)
+    load_item_list = gradio_app._load_item_list
+
+    def load_then_write_concurrently(client, company_id):
+        item_list = load_item_list(client, company_id)
+        other_client.hset(f"company:{company_id}", "item_list", orjson.dumps([]))
+        return item_list
+
+    monkeypatch.setattr(gradio_app, "_load_item_list", load_then_write_concurrently)
+
+    assert _save_new_items(COMPANY_ID, {"a": {"name": "Logo"}}) == []
+    assert _stored_item_names(redis_client) == []
+
+
+def test_save_item_to_database(redis_client):
+    _store_company(redis_client, [])
+    item = {"name": "Logo", "unit_price": 100, "tax_rate": 24}
+
+    assert save_item_to_database(COMPANY_ID, item)
+    # The item list is checked inside the transaction, so the item is not saved twice
+    assert not save_item_to_database(COMPANY_ID, {**item, "name": "logo"})
+    assert _stored_item_names(redis_client) == ["Logo"]
+
+
+def test_save_multiple_items_in_one_transaction(redis_client, monkeypatch):
+    _store_company(redis_client, [{"item_name": "Hosting", "unit_price": 9.5}])
+    load_item_list = gradio_app._load_item_list
+    loads = []
+
+    def count_loads(client, company_id):
+        loads.append(company_id)
+        return load_item_list(client, company_id)
+
+    monkeypatch.setattr(gradio_app, "_load_item_list", count_loads)
+    items = {
+        "a": {"name": "Logo", "unit_price": 100, "tax_rate": 24},
+        "b": {"name": "Banner", "unit_price": 20, "tax_rate": 24},
+        "c": {"name": "Hosting", "unit_price": 9.5, "tax_rate": 24},
+        "d": {"name": "Poster", "unit_price": 5, "tax_rate": 24},
+    }
+    saved_items = {"d"}
+
+    results = save_multiple_items_to_database(COMPANY_ID, items, saved_items)
+
+    assert results == {
+        "a": "success",
+        "b": "success",
+        "c": "failed",
+        "d": "already_saved",
+    }
+    assert saved_items == {"a", "b", "d"}
+    assert len(loads) == 1
+    assert _stored_item_names(redis_client) == ["Hosting", "Logo", "Banner"]
+
+
+def test_get_invoice_html_does_not_modify_invoice():
+    invoice = {"business_name": "ABC Solutions", "items": [], "total_due": 0}
+    new_items = {"a": {"name": "Logo", "quantity": 2, "unit_price": 10, "tax_rate": 10}}
+
+    invoice_data, invoice_html = get_invoice_html(invoice, [], new_items)
+
+    assert invoice == {"business_name": "ABC Solutions", "items": [], "total_due": 0}
+    assert invoice_data["items"][0]["total_price"] == 20.0
+    assert invoice_data["total_due"] == 22.0
+    assert "Logo" in invoice_html
+
+
+def test_get_invoice_html_is_memoized_on_content():
+    invoice = {"business_name": "Memo", "items": []}
+    new_items = {"a": {"name": "Logo", "quantity": 1, "unit_price": 5, "tax_rate": 0}}
+    get_invoice_html(invoice, [], new_items)
+    hits = gradio_app._format_invoice_as_html_cached.cache_info().hits
+
+    _, invoice_html = get_invoice_html(dict(invoice), [], {"b": dict(new_items["a"])})
+
+    assert gradio_app._format_invoice_as_html_cached.cache_info().hits == hits + 1
+    assert "Memo" in invoice_html
+    # Any change of the content is rendered again
+    _, invoice_html = get_invoice_html({**invoice, "business_name": "Other"}, [], {})
+    assert "Other" in invoice_html
+
+
+def test_format_invoice_as_html_escapes_the_raw_fallback():
+    invoice_html = gradio_app.format_invoice_as_html({"items": "<b>broken</b>"})
+
+    assert invoice_html.startswith("<pre>")
+    assert "<b>" not in invoice_html
+
+
+def test_reset_timer_only_runs_while_a_reset_is_pending():
+    session_state = {"reset_at": None}
+
+    assert not activate_reset_timer(session_state).active
+    schedule_reset_with_status(session_state, "Saved")
+    assert activate_reset_timer(session_state).active
+
+
+def test_reset_runs_once_its_deadline_has_passed(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(gradio_app.time, "monotonic", lambda: now)
+    thread = Thread()
+    session_state = {"thread": thread, "current_invoice": {}, "reset_at": None}
+    schedule_reset_with_status(session_state, "Saved")
+
+    now += gradio_app.RESET_DELAY - 1
+    assert check_for_reset(session_state)[-1] == gradio_app.gr.skip()
+    assert session_state["thread"] is thread
+
+    now += 1
+    *_, timer = check_for_reset(session_state)
+    assert not timer.active
+    assert session_state["thread"] is not thread
+    assert session_state["reset_at"] is None
+
+
+def _new_item(name: str, **fields) -> dict:
+    return {
+        "name": name,
+        "quantity": "PLACEHOLDER",
+        "unit_price": "PLACEHOLDER",
+        "tax_rate": "PLACEHOLDER",
+        "total_price": "PLACEHOLDER",
+        "is_new_item": True,
+        **fields,
+    }
+
+
+class FollowUpThread(Thread):
+    """Thread answering with a reasoning of the given new items."""
+
+    def __init__(self, new_items: list):
+        super().__init__()
+        self.new_items = new_items
+
+    async def async_send_message(self, content, save_message, **kwargs):
+        response = {
+            "reasoning": {
+                "Analysis": {
+                    "analysis": "",
+                    "available_items": [],
+                    "new_items": self.new_items,
+                },
+                "is_valid_invoice": True,
+                "has_new_items": True,
+                "decision_analysis": "",
+                "Calculations": "",
+            },
+            "invoice": {"output": "Waiting for the new items."},
+        }
+        return Message(role="assistant", content=orjson.dumps(response).decode())
+
+
+def _follow_up(existing_items_dict: dict, refreshed_items: list) -> dict:
+    session_state = {
+        "thread": FollowUpThread(refreshed_items),
+        "available_items": [],
+        "new_items_dict": existing_items_dict,
+    }
+
+    async def run():
+        return [
+            outputs
+            async for outputs in send_follow_up_message(COMPANY_ID, "", session_state)
+        ]
+
+    outputs = asyncio.run(run())
+    assert outputs[-1][0] != gradio_app.LLM_ERROR_MESSAGE
+    return session_state["new_items_dict"]
+
+
+def test_follow_up_preserves_edits_of_renamed_items(redis_client):
+    _store_company(redis_client, [])
+    existing = assign_ids_to_new_items([_new_item("Logo")])
+    # The user renamed the item and filled in its price, its ID is unchanged
+    next(iter(existing.values())).update(name="Logo Design", unit_price=100.0)
+
+    merged = _follow_up(existing, [_new_item("Logo Design", quantity=2)])
+
+    [item] = merged.values()
+    assert (item["name"], item["quantity"], item["unit_price"]) == (
+        "Logo Design",
+        2,
+        100.0,
+    )
+
+
+def test_follow_up_matches_placeholder_names_filled_in(redis_client):
+    _store_company(redis_client, [])
+    existing = assign_ids_to_new_items([_new_item("PLACEHOLDER")])
+    next(iter(existing.values())).update(name="Banner", tax_rate=24.0)
+
+    merged = _follow_up(existing, [_new_item("banner ")])
+
+    [item] = merged.values()
+    assert (item["name"], item["tax_rate"]) == ("Banner", 24.0)
+
+
+def test_follow_up_does_not_merge_items_sharing_an_id(redis_client):
+    _store_company(redis_client, [])
+    existing = assign_ids_to_new_items([_new_item("Logo"), _new_item("Logo")])
+    # The user renamed the first "Logo", which keeps the ID of the name "Logo"
+    first, second = existing.values()
+    first.update(name="Poster", unit_price=1.0)
+    second.update(unit_price=2.0)
+
+    merged = _follow_up(existing, [_new_item("Logo"), _new_item("Poster")])
+
+    assert {item["name"]: item["unit_price"] for item in merged.values()} == {
+        "Logo": 2.0,
+        "Poster": 1.0,
+    }
@@ -0,0 +1,57 @@
+import pytest
+from pydantic import ValidationError
+
+from schema import LLMResponse
+from utils import extract_reasoning_and_invoice
+
+RESPONSE = {
+    "reasoning": {
+        "Analysis": {
+            "analysis": "One item requested.",
+            "available_items": [
+                {
+                    "name": "Web Development",
+                    "quantity": 10,
+                    "unit_price": 50.0,
+                    "tax_rate": 24.0,
+                    "total_price": 500.0,
+                }
+            ],
+            "new_items": [{"name": "Logo Design", "quantity": 1}],
+        },
+        "is_valid_invoice": True,
+        "has_new_items": True,
+        "decision_analysis": "The request is complete.",
+        "Calculations": "10 × 50 = 500",
+    },
+    "invoice": {"output": "Waiting for the new items."},
+}
+
+
+def test_extract_reasoning_and_invoice_from_content():
+    content = LLMResponse.model_validate(RESPONSE).model_dump_json()
+
+    reasoning, invoice = extract_reasoning_and_invoice(content)
+
+    assert reasoning["is_valid_invoice"] is True
+    assert reasoning["Analysis"]["available_items"][0]["name"] == "Web Development"
+    # Missing fields of new items are filled with PLACEHOLDER
+    new_item = reasoning["Analysis"]["new_items"][0]
+    assert new_item["unit_price"] == "PLACEHOLDER"
+    assert new_item["is_new_item"] is True
+    assert invoice == {"output": "Waiting for the new items."}
+
+
+def test_extract_reasoning_and_invoice_prefers_parsed_response():
+    parsed = LLMResponse.model_validate(RESPONSE)
+
+    reasoning, invoice = extract_reasoning_and_invoice("not json", parsed)
+
+    assert reasoning == parsed.reasoning.model_dump()
+    assert invoice == parsed.invoice.model_dump()
+
+
+@pytest.mark.parametrize("content", ["", '{"reasoning": {"Analysis": '])
+def test_extract_reasoning_and_invoice_rejects_incomplete_content(content):
+    with pytest.raises(ValidationError):
+        extract_reasoning_and_invoice(content)
@@ -1,31 +1,35 @@
-import json
+import functools
 import tomllib
 from pathlib import Path
 
 from schema import LLMResponse
 
 
-def extract_reasoning_and_invoice(response_content: str) -> tuple[dict, dict]:
+def extract_reasoning_and_invoice(
+    response_content: str, parsed_response: LLMResponse | None = None
+) -> tuple[dict, dict]:
     """Extract reasoning and invoice from the LLM response content.
 
     Args:
         response_content (str): The response content from the LLM.
+        parsed_response (LLMResponse | None): The response already validated by the
+            structured output call, if available. The content is only parsed without it.
 
     Returns:
-        Tuple[dict, dict]: The reasoning and the invoice as a dictionary.
+        Tuple[dict, dict]: The reasoning and the invoice as dictionaries.
     """
     # Parse the response content using the LLMResponse model
-    response = LLMResponse.model_validate_json(response_content)
+    response = parsed_response or LLMResponse.model_validate_json(response_content)
 
-    # Extract reasoning and invoice
-    reasoning = json.dumps(
-        response.reasoning.model_dump(), indent=2, ensure_ascii=False
-    )
-    invoice = json.dumps(response.invoice.model_dump(), indent=2, ensure_ascii=False)
+    # Extract reasoning and invoice. Both are consumed as dictionaries right away, so
+    # they are dumped straight from the model instead of going through JSON
+    reasoning = response.reasoning.model_dump()
+    invoice = response.invoice.model_dump()
 
     return reasoning, invoice
 
 
+@functools.cache
 def load_system_prompt(file_path: str) -> str:
     """Load the system prompt from a text file.
 
@@ -35,6 +39,7 @@ def load_system_prompt(file_path: str) -> str:
     Returns:
         str: The system prompt.
     """
+    # The prompt files do not change while the app runs, so each is read only once
     with open(file_path) as file:
         return file.read().strip()
 
@@ -44,6 +49,7 @@ def get_package_root() -> Path:
     return Path(__file__).parent.parent
 
 
+@functools.cache
 def get_project_version() -> str:
     """Get the project version from pyproject.toml.
 